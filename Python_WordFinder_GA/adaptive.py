@@ -0,0 +1,156 @@
+﻿"""Adaptive sampling of the PopulationMap grids.
+
+Instead of running every cell of the population x mutation rate grid, a sweep starts
+from a coarse lattice of cells and splits a block of the grid in four only where the
+average generations at its corners change sharply or are noisy. Cells left out are
+interpolated from the corners of the smallest block around them.
+
+Runs of the measured cells are added in doubling rounds (2, 4, 8... up to the
+iterations) and a cell whose runs all hit the max generation is dropped after the
+round: successive halving of the budget spent on hopeless parameter combinations.
+
+Sequential sampling picks the iterations of every cell instead: runs are added to a
+cell until the confidence interval of its mean generations is narrow enough."""
+import math
+from statistics import NormalDist
+
+
+def cellstats(runs):
+    """Returns the mean and sample standard deviation of a cell's runs"""
+    mean = sum(runs) / len(runs)
+    if len(runs) < 2:
+        return mean, 0.0
+    return mean, math.sqrt(sum((run - mean)**2 for run in runs) / (len(runs) - 1))
+
+
+def tquantile(confidence, df):
+    """Returns the two-sided critical value of Student's t for a confidence (e.g. 0.95)
+    and df degrees of freedom, from the normal quantile with the Cornish-Fisher expansion"""
+    p = (1 + confidence) / 2
+    #Closed forms where the expansion is poor
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    return (z + (z**3 + z) / (4 * df) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2) +
+            (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3))
+
+
+def confidencewidth(runs, confidence=0.95):
+    """Returns the full width of the confidence interval of the mean of some runs"""
+    if len(runs) < 2:
+        return float('inf')
+    mean, std = cellstats(runs)
+    return 2 * tquantile(confidence, len(runs) - 1) * std / math.sqrt(len(runs))
+
+
+def sequentialsampling(cells, runbatch, ciwidth, miniterations=3, maxiterations=50,
+                       confidence=0.95):
+    """Returns the generations of the runs of every cell. Every cell gets miniterations
+    runs, then more runs until the confidence interval of its mean is ciwidth
+    generations wide or it has maxiterations runs.
+    runbatch takes a list of (cell, iteration) runs and returns their generations in order."""
+    runs = {cell: list() for cell in cells}
+    wanted = {cell: miniterations for cell in cells}
+    while True:
+        batch = [(cell, iteration) for cell in cells
+                 for iteration in range(len(runs[cell]), min(wanted[cell], maxiterations))]
+        if not batch:
+            return runs
+        for (cell, iteration), generations in zip(batch, runbatch(batch)):
+            runs[cell].append(generations)
+        for cell in cells:
+            n = len(runs[cell])
+            width = confidencewidth(runs[cell], confidence)
+            if width > ciwidth and n < maxiterations:
+                if math.isinf(width):
+                    #A single run has no interval yet: double the runs
+                    wanted[cell] = 2 * n
+                else:
+                    #The width shrinks as 1 / sqrt(n): aim for the n that should be enough,
+                    #at most doubling the runs so a noisy start doesn't ask for too many
+                    wanted[cell] = min(2 * n, max(n + 1, int(math.ceil(n * (width / ciwidth)**2))))
+
+
+def successivehalving(cells, iterations, maxgen, runbatch):
+    """Returns the generations of the runs of every cell.
+    runbatch takes a list of (cell, iteration) runs and returns their generations in order.
+    Cells whose runs all reached maxgen stop getting more runs."""
+    runs = {cell: list() for cell in cells}
+    alive = list(cells)
+    #A single run hitting maxgen says too little to drop a cell
+    budget = 2
+    while alive:
+        budget = min(budget, iterations)
+        batch = [(cell, iteration) for cell in alive for iteration in range(len(runs[cell]), budget)]
+        for (cell, iteration), generations in zip(batch, runbatch(batch)):
+            runs[cell].append(generations)
+        if budget == iterations:
+            break
+        alive = [cell for cell in alive if min(runs[cell]) < maxgen]
+        budget *= 2
+    return runs
+
+
+def splitpoints(start, stop):
+    """Returns the grid lines of a block side after splitting it in two"""
+    if stop - start < 2:
+        return [start, stop]
+    return [start, (start + stop) // 2, stop]
+
+
+def adaptivegrid(rows, columns, measure, coarsestep=4, threshold=1.0):
+    """Samples a rows x columns grid of (row, column) index cells.
+    measure takes a list of cells and returns {cell: list of run generations}.
+    A block is split when its corners' means differ by more than threshold
+    or the standard error of one of them is over it.
+    Returns ({cell: mean}, {cell: (mean, std, n)} of the measured cells) with the
+    means of the cells left out interpolated."""
+    rowlines = sorted(set(list(range(0, rows, coarsestep)) + [rows - 1]))
+    columnlines = sorted(set(list(range(0, columns, coarsestep)) + [columns - 1]))
+    blocks = [(r0, r1, c0, c1)
+              for r0, r1 in zip(rowlines, rowlines[1:] or rowlines)
+              for c0, c1 in zip(columnlines, columnlines[1:] or columnlines)]
+    stats = dict()
+    finalblocks = list()
+    while blocks:
+        #Every corner not measured yet is measured in one batch per level
+        corners = list()
+        for r0, r1, c0, c1 in blocks:
+            for cell in ((r0, c0), (r0, c1), (r1, c0), (r1, c1)):
+                if cell not in stats and cell not in corners:
+                    corners.append(cell)
+        for cell, runs in measure(corners).items():
+            mean, std = cellstats(runs)
+            stats[cell] = (mean, std, len(runs))
+
+        nextblocks = list()
+        for r0, r1, c0, c1 in blocks:
+            cornerstats = [stats[cell] for cell in ((r0, c0), (r0, c1), (r1, c0), (r1, c1))]
+            means = [mean for mean, std, n in cornerstats]
+            sharp = max(means) - min(means) > threshold
+            noisy = max(std / math.sqrt(n) for mean, std, n in cornerstats) > threshold
+            if (sharp or noisy) and (r1 - r0 > 1 or c1 - c0 > 1):
+                rowsplit = splitpoints(r0, r1)
+                columnsplit = splitpoints(c0, c1)
+                for s0, s1 in zip(rowsplit, rowsplit[1:]):
+                    for t0, t1 in zip(columnsplit, columnsplit[1:]):
+                        nextblocks.append((s0, s1, t0, t1))
+            else:
+                finalblocks.append((r0, r1, c0, c1))
+        blocks = nextblocks
+
+    values = {cell: mean for cell, (mean, std, n) in stats.items()}
+    for r0, r1, c0, c1 in finalblocks:
+        for row in range(r0, r1 + 1):
+            for column in range(c0, c1 + 1):
+                if (row, column) in values:
+                    continue
+                #Bilinear interpolation between the block corners
+                y = (row - r0) / (r1 - r0) if r1 > r0 else 0
+                x = (column - c0) / (c1 - c0) if c1 > c0 else 0
+                values[(row, column)] = (
+                    stats[(r0, c0)][0] * (1 - y) * (1 - x) + stats[(r0, c1)][0] * (1 - y) * x +
+                    stats[(r1, c0)][0] * y * (1 - x) + stats[(r1, c1)][0] * y * x)
+    return values, stats
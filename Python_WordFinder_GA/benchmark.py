@@ -0,0 +1,198 @@
+﻿"""Benchmark harness comparing the speed of the genetic algorithm variants.
+
+Every case runs on fixed seeds, targets and grid sizes and the report is saved as JSON
+so results can be compared between versions:
+    python benchmark.py --output benchmark.json --label my-change"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import wordfinder_ga
+import wordfinder_ga_fork
+import wordfinder_ga_threading
+
+try:
+    import resource
+except ImportError:
+    #Not available on Windows: peak RSS is reported as None
+    resource = None
+
+TEXT = 'to be or not to be that is the question '
+SEED = 2018
+MAX_GENERATION = 200
+
+
+def maketarget(length):
+    """Returns a fixed target of a given length"""
+    return (TEXT * (length // len(TEXT) + 1))[:length]
+
+
+#Every variant is run through the same call: (target, population, max generation, seed) -> generations
+VARIANTS = {
+    'wordfinder_ga': lambda target, population, maxgen, seed:
+                     wordfinder_ga.Population(target, 5, population, seed=seed).runcount(maxgen),
+    'wordfinder_ga.VectorPopulation': lambda target, population, maxgen, seed:
+                                      wordfinder_ga.VectorPopulation(target, 5, population, seed).runcount(maxgen),
+    'wordfinder_ga_threading': lambda target, population, maxgen, seed:
+                               wordfinder_ga_threading.Population(target, population, 0.05, seed=seed).run_silent(maxgen),
+    'wordfinder_ga_fork': lambda target, population, maxgen, seed:
+                          wordfinder_ga_fork.Population(target, 5, population, 3, seed).runcount(maxgen),
+    'wordfinder_ga_fork.VectorPopulation': lambda target, population, maxgen, seed:
+                                           wordfinder_ga_fork.VectorPopulation(target, 5, population, 3, seed).runcount(maxgen),
+    }
+
+
+def peakrss():
+    """Returns the peak resident set size of this process in KiB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #macOS reports bytes, Linux reports KiB
+    if platform.system() == 'Darwin':
+        peak //= 1024
+    return peak
+
+
+def runcase(case):
+    """Runs one Population case. It runs on a fresh worker process so the peak RSS is its own"""
+    target = maketarget(case['length'])
+    start_time = time.perf_counter()
+    generations = VARIANTS[case['variant']](
+        target, case['population'], case['max_generation'], case['seed'])
+    seconds = time.perf_counter() - start_time
+    result = dict(case)
+    result['generations'] = generations
+    result['seconds'] = seconds
+    result['generations_per_second'] = generations / seconds
+    result['individuals_per_second'] = generations * case['population'] / seconds
+    result['peak_rss_kb'] = peakrss()
+    return result
+
+
+def runmap(variant, target, iterations):
+    """Times a small PopulationMap grid in a temporary directory so data.csv is not touched"""
+    workdir = os.getcwd()
+    tempdir = tempfile.mkdtemp()
+    try:
+        os.chdir(tempdir)
+        start_time = time.perf_counter()
+        if variant == 'wordfinder_ga':
+            wordfinder_ga.PopulationMap(target, MAX_GENERATION, 30, 40, 1, 3, seed=SEED).fillmap(
+                target, MAX_GENERATION, 30, 40, 1, 3, iterations)
+        elif variant == 'wordfinder_ga.VectorPopulation':
+            wordfinder_ga.PopulationMap(target, MAX_GENERATION, 30, 40, 1, 3,
+                                        wordfinder_ga.VectorPopulation, SEED).fillmap(
+                                            target, MAX_GENERATION, 30, 40, 1, 3, iterations)
+        elif variant == 'wordfinder_ga_threading':
+            wordfinder_ga_threading.PopulationMap(target, 30, 40, 5, 0.01, 0.03, 0.01, SEED).run(
+                iterations, MAX_GENERATION)
+        elif variant == 'wordfinder_ga_fork.VectorPopulation':
+            wordfinder_ga_fork.PopulationMap(target, MAX_GENERATION, 30, 40, 1, 3, 3, SEED,
+                                             wordfinder_ga.VectorPopulation).fillmap(
+                                                 target, MAX_GENERATION, 30, 40, 1, 3, iterations)
+        else:
+            wordfinder_ga_fork.PopulationMap(target, MAX_GENERATION, 30, 40, 1, 3, 3, SEED).fillmap(
+                target, MAX_GENERATION, 30, 40, 1, 3, iterations)
+        seconds = time.perf_counter() - start_time
+    finally:
+        os.chdir(workdir)
+        shutil.rmtree(tempdir)
+    return {'variant': variant, 'kind': 'map', 'length': len(target), 'cells': 9,
+            'iterations': iterations, 'seconds': seconds,
+            'cells_per_second': 9 / seconds}
+
+
+def makecases(populations, lengths, repeat):
+    """Returns the Population cases: a population curve and a target length curve per variant"""
+    cases = list()
+    for variant in VARIANTS:
+        for population in populations:
+            for i in range(repeat):
+                cases.append({'variant': variant, 'kind': 'population', 'population': population,
+                              'length': lengths[0], 'seed': SEED + i,
+                              'max_generation': MAX_GENERATION})
+        for length in lengths[1:]:
+            for i in range(repeat):
+                cases.append({'variant': variant, 'kind': 'length', 'population': populations[0],
+                              'length': length, 'seed': SEED + i,
+                              'max_generation': MAX_GENERATION})
+    return cases
+
+
+def summarize(results):
+    """Averages the repeated cases into scaling curves per variant"""
+    curves = dict()
+    for result in results:
+        if result['kind'] == 'map':
+            continue
+        variant = curves.setdefault(result['variant'], {'population': {}, 'length': {}})
+        x = result['population'] if result['kind'] == 'population' else result['length']
+        point = variant[result['kind']].setdefault(
+            x, {'runs': 0, 'seconds': 0, 'generations': 0, 'individuals': 0})
+        point['runs'] += 1
+        point['seconds'] += result['seconds']
+        point['generations'] += result['generations']
+        point['individuals'] += result['generations'] * result['population']
+    for variant in curves.values():
+        for curve in variant.values():
+            for point in curve.values():
+                point['generations_per_second'] = point['generations'] / point['seconds']
+                point['individuals_per_second'] = point['individuals'] / point['seconds']
+    return curves
+
+
+def benchmark(populations, lengths, repeat, iterations):
+    """Runs every case and returns the full report"""
+    results = list()
+    for case in makecases(populations, lengths, repeat):
+        #A fresh process per case: peak RSS and the seeded state are not shared between cases
+        pool = Pool(1)
+        try:
+            result = pool.apply(runcase, (case, ))
+        finally:
+            pool.close()
+            pool.join()
+        print('\t{variant:<40}{kind:<12}N={population:<6}L={length:<6}'
+              '{seconds:8.3f} s {generations_per_second:10.1f} gen/s'.format(**result))
+        results.append(result)
+    for variant in VARIANTS:
+        result = runmap(variant, maketarget(lengths[0]), iterations)
+        print('\t{variant:<40}{kind:<12}{cells} cells{seconds:16.3f} s'.format(**result))
+        results.append(result)
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': SEED,
+        'max_generation': MAX_GENERATION,
+        'results': results,
+        'curves': summarize(results),
+        }
+
+
+#Launch the benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark.json', help='JSON report file')
+    parser.add_argument('--label', default='', help='name of the measured version')
+    parser.add_argument('--quick', action='store_true', help='small grid for a smoke run')
+    arguments = parser.parse_args()
+
+    if arguments.quick:
+        report = benchmark([20, 50], [5, 10], 1, 1)
+    else:
+        report = benchmark([50, 100, 200, 500], [10, 20, 40, 80], 3, 3)
+    report['label'] = arguments.label
+
+    with open(arguments.output, 'w') as fileobj:
+        json.dump(report, fileobj, indent=2, sort_keys=True)
+    print('\tSaved to {}'.format(arguments.output))
@@ -0,0 +1,93 @@
+﻿"""Convergence detection and early stopping for the simulations.
+
+A ConvergenceMonitor records the best score, mean score and diversity of every
+generation and asks its stop policies whether the run should go on. Policies keep
+no state of their own, so the same policy objects can be shared by every run of a
+PopulationMap sweep and sent to worker processes."""
+import time
+
+
+class StopPolicy(object):
+    """Base class for the stop policies."""
+
+    def check(self, monitor):
+        """Returns the reason to stop the run or None to keep going"""
+        raise NotImplementedError
+
+
+class NoImprovement(StopPolicy):
+    """Stops when the best score hasn't improved for a number of generations."""
+
+    def __init__(self, generations):
+        self.generations = generations
+
+    def check(self, monitor):
+        if monitor.generation - monitor.lastimprovement >= self.generations:
+            return 'no improvement for {} generations'.format(self.generations)
+        return None
+
+
+class DiversityCollapse(StopPolicy):
+    """Stops when the share of distinct individuals falls to a threshold (0 to 1)."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def check(self, monitor):
+        if monitor.diversity[-1] <= self.threshold:
+            return 'diversity collapsed to {:.2f}'.format(monitor.diversity[-1])
+        return None
+
+
+class TimeBudget(StopPolicy):
+    """Stops when the run has used up a wall-clock budget in seconds."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def check(self, monitor):
+        if time.time() - monitor.starttime >= self.seconds:
+            return 'time budget of {} seconds used'.format(self.seconds)
+        return None
+
+
+class ConvergenceMonitor(object):
+    """Tracks best/mean fitness and diversity per generation and tells why a run stopped."""
+
+    TARGET = 'target reached'
+    MAX_GENERATION = 'max generation reached'
+
+    def __init__(self, policies=()):
+        self.policies = list(policies)
+        self.best = list()
+        self.mean = list()
+        self.diversity = list()
+        self.generation = 0
+        self.bestscore = None
+        self.lastimprovement = 0
+        self.starttime = time.time()
+        self.reason = None
+
+    def update(self, scores, dnas):
+        """Records one generation from its scores and dnas.
+        Returns the reason to stop the run or None to keep going."""
+        self.generation += 1
+        best = max(scores)
+        if self.bestscore is None or best > self.bestscore:
+            self.bestscore = best
+            self.lastimprovement = self.generation
+        self.best.append(best)
+        self.mean.append(sum(scores) / len(scores))
+        self.diversity.append(len(set(dnas)) / len(dnas))
+        for policy in self.policies:
+            reason = policy.check(self)
+            if reason is not None:
+                self.reason = reason
+                return reason
+        return None
+
+    def finish(self, reachedtarget):
+        """Records why a run stopped when no policy stopped it"""
+        if self.reason is None:
+            self.reason = self.TARGET if reachedtarget else self.MAX_GENERATION
+        return self.reason
@@ -0,0 +1,175 @@
+﻿"""Fitness functions of the genetic algorithm populations.
+
+A fitness scores every gene of an individual against the target and combines the
+gene scores into the individual's score. Populations keep the gene scores of every
+individual, so a child gets its parents' gene scores with its genes and only the
+mutated genes are scored again.
+
+Every built-in fitness also has batch kernels scoring a whole uint8 gene matrix
+(rows are individuals) at once for the vector engines. Their values are the scores,
+except for ExactMatch where they are the match counts (log2 of the 2**matches score)
+so long targets don't overflow.
+
+Populations take a name in FITNESSES, a Fitness class or instance, or a user-supplied
+gene score function (targetchar, char, position) -> int. Scores must be integers:
+the roulette wheel selections draw integers up to the total score. The target itself
+has to be the fittest individual: its score is the target score."""
+import numpy as np
+
+
+class Fitness(object):
+    """Base class for the fitness functions. Subclasses give genescore,
+    the other methods are generic fallbacks."""
+
+    def genescore(self, targetchar, char, position):
+        """Returns the score of a single gene"""
+        raise NotImplementedError
+
+    def genescores(self, target, dna):
+        """Returns the per-gene scores of a given individual"""
+        genescore = self.genescore
+        return [genescore(tchar, char, position)
+                for position, (tchar, char) in enumerate(zip(target, dna))]
+
+    def score(self, genescores):
+        """Evaluates an individual's score from its gene scores"""
+        return sum(genescores)
+
+    def targetscore(self, target):
+        """Returns the score of an individual matching the target"""
+        return self.score(self.genescores(target, target))
+
+    ##BATCH KERNELS##
+
+    def batchvalues(self, targetgenes, genes):
+        """Returns the value of every row of a gene matrix"""
+        #Generic fallback: one row at a time
+        target = targetgenes.tobytes().decode('latin-1')
+        return np.array([self.score(self.genescores(target, row.tobytes().decode('latin-1')))
+                         for row in genes], dtype=np.int64)
+
+    def targetvalue(self, targetgenes):
+        """Returns the value of an individual matching the target"""
+        return self.batchvalues(targetgenes, targetgenes[np.newaxis])[0]
+
+    def valuescore(self, value):
+        """Returns the score of a value"""
+        return int(value)
+
+    def selectionweights(self, values):
+        """Returns the selection weights of some values, proportional to their scores"""
+        return values.astype(np.float64)
+
+    def parentratio(self, values_a, values_b):
+        """Returns the chance of taking a gene from parent a: score a / (score a + score b).
+        Parents with a score of 0 both get even odds."""
+        weights_a = self.selectionweights(values_a)
+        totals = weights_a + self.selectionweights(values_b)
+        return np.divide(weights_a, totals, out=np.full(len(totals), 0.5), where=totals > 0)
+
+
+class ExactMatch(Fitness):
+    """1 for every gene equal to the target's, 0 otherwise.
+    The score is 2**matches: every match doubles the odds of being picked."""
+
+    def genescore(self, targetchar, char, position):
+        return int(targetchar == char)
+
+    def genescores(self, target, dna):
+        #bytearray.count keeps the score a C loop
+        return bytearray([tchar == char for tchar, char in zip(target, dna)])
+
+    def score(self, genescores):
+        return 2**genescores.count(1)
+
+    def batchvalues(self, targetgenes, genes):
+        """Returns the number of matching genes of every row (score is 2**matches)"""
+        return np.count_nonzero(genes == targetgenes, axis=1)
+
+    def targetvalue(self, targetgenes):
+        return len(targetgenes)
+
+    def valuescore(self, value):
+        return 2**int(value)
+
+    def selectionweights(self, values):
+        #Shifted by the best one so 2**matches never overflows
+        return np.exp2(values - values.max())
+
+    def parentratio(self, values_a, values_b):
+        """Returns 2**a / (2**a + 2**b), computed from the match difference
+        so it never overflows"""
+        difference = np.clip(values_b - values_a, -64, 64)
+        return 1 / (1 + np.exp2(difference))
+
+
+class Distance(Fitness):
+    """Every gene scores higher the closer its character code is to the target's,
+    from 0 to maxelem - minelem for an exact match."""
+
+    def __init__(self, minelem=32, maxelem=126):
+        self.minelem = minelem
+        self.maxelem = maxelem
+
+    def genescore(self, targetchar, char, position):
+        return self.maxelem - self.minelem - abs(ord(targetchar) - ord(char))
+
+    def batchvalues(self, targetgenes, genes):
+        """Returns the summed gene scores of every row"""
+        distance = np.abs(genes.astype(np.int16) - targetgenes.astype(np.int16)).sum(axis=1)
+        return (self.maxelem - self.minelem) * len(targetgenes) - distance.astype(np.int64)
+
+
+class WeightedPosition(Fitness):
+    """Every gene equal to the target's scores the integer weight of its position.
+    Without weights the gene at position i weighs i + 1."""
+
+    def __init__(self, weights=None):
+        self.weights = weights
+
+    def positionweights(self, length):
+        """Returns the weights of the first length positions"""
+        if self.weights is None:
+            return list(range(1, length + 1))
+        return list(self.weights[:length])
+
+    def genescore(self, targetchar, char, position):
+        if targetchar != char:
+            return 0
+        return position + 1 if self.weights is None else self.weights[position]
+
+    def batchvalues(self, targetgenes, genes):
+        """Returns the weights of the matching genes of every row summed up"""
+        weights = np.array(self.positionweights(len(targetgenes)), dtype=np.int64)
+        return (genes == targetgenes) @ weights
+
+
+class UserFitness(Fitness):
+    """Wraps a user-supplied gene score function (targetchar, char, position) -> int.
+    Its batch kernel is the generic one row at a time fallback."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def genescore(self, targetchar, char, position):
+        return self.function(targetchar, char, position)
+
+
+FITNESSES = {'exact': ExactMatch, 'distance': Distance, 'weighted': WeightedPosition}
+
+
+def register(name, fitness):
+    """Adds a Fitness class or a gene score function to FITNESSES under a name"""
+    FITNESSES[name] = fitness
+
+
+def getfitness(fitness='exact'):
+    """Returns a Fitness instance from a name in FITNESSES, a Fitness class or instance
+    or a gene score function"""
+    if isinstance(fitness, str):
+        fitness = FITNESSES[fitness]
+    if isinstance(fitness, Fitness):
+        return fitness
+    if isinstance(fitness, type) and issubclass(fitness, Fitness):
+        return fitness()
+    return UserFitness(fitness)
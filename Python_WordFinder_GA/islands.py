@@ -0,0 +1,167 @@
+﻿"""Island model: several wordfinder_ga populations evolving on their own processes.
+
+Every island is a Population running on a worker process. Every few generations the
+islands stop, send copies of their best individuals to other islands following a
+topology, and replace their worst individuals with the ones they receive."""
+import time
+from multiprocessing import Pipe, Process
+
+from rngstreams import pythonrandom, spawn
+from wordfinder_ga import Population
+
+
+def ringtopology(island, islands, rng):
+    """Every island sends to the next one"""
+    return [(island + 1) % islands]
+
+
+def fulltopology(island, islands, rng):
+    """Every island sends to all the others"""
+    return [other for other in range(islands) if other != island]
+
+
+def randomtopology(island, islands, rng):
+    """Every island sends to another island picked at random"""
+    other = rng.randrange(islands - 1)
+    return [other + 1 if other >= island else other]
+
+
+TOPOLOGIES = {'ring': ringtopology, 'full': fulltopology, 'random': randomtopology}
+
+
+def bestscore(island):
+    """Returns the best score of an island's population"""
+    if island.stats is not None:
+        return island.stats.bestscore
+    #Immigrants changed the list by hand: no statistics until the next generation
+    return max(element.score for element in island.populationlist)
+
+
+def islandworker(connection, target, mutationrate, population, seed):
+    """Runs one island: waits for commands from the IslandModel and answers them"""
+    island = Population(target, mutationrate, population, seed=seed)
+    generation = 1
+    while True:
+        command, argument = connection.recv()
+        if command == 'evolve':
+            #Evolves up to a number of generations, stopping when the target is found
+            found = False
+            for _ in range(argument):
+                if bestscore(island) >= island.targetscore:
+                    found = True
+                    break
+                island.step()
+                generation += 1
+            if not found:
+                found = bestscore(island) >= island.targetscore
+            connection.send((found, generation))
+        elif command == 'emigrate':
+            #Copies of the best individuals leave, the island keeps them too
+            ranked = sorted(island.populationlist, key=lambda element: element.score, reverse=True)
+            connection.send(ranked[:argument])
+        elif command == 'immigrate':
+            #The newcomers replace the worst individuals
+            island.populationlist.sort(key=lambda element: element.score)
+            island.populationlist[:len(argument)] = argument
+            island.scoreindex = None
+            island.stats = None
+            connection.send(None)
+        else:
+            connection.close()
+            return
+
+
+class IslandModel(object):
+    """Runs a search on several islands with periodic migration"""
+
+    #Constructor
+    def __init__(self, target, mutationrate, population, islands,
+                 migrants=2, interval=10, topology='ring', seed=None):
+        self.target = target
+        self.mutationrate = mutationrate
+        self.population = population
+        self.islands = islands
+        #Top individuals sent by every island every interval generations
+        self.migrants = migrants
+        self.interval = interval
+        #Name in TOPOLOGIES or a function (island, islands, rng) -> receiving islands
+        self.topology = TOPOLOGIES.get(topology, topology)
+        self.seed = seed
+
+    def migrate(self, connections, rng):
+        """Moves the best individuals of every island following the topology"""
+        for connection in connections:
+            connection.send(('emigrate', self.migrants))
+        emigrants = [connection.recv() for connection in connections]
+        arrivals = [list() for _ in connections]
+        for island, individuals in enumerate(emigrants):
+            for destination in self.topology(island, self.islands, rng):
+                arrivals[destination].extend(individuals)
+        for connection, individuals in zip(connections, arrivals):
+            #Only the best newcomers settle when several islands send to the same one
+            individuals.sort(key=lambda element: element.score, reverse=True)
+            connection.send(('immigrate', individuals[:self.migrants]))
+        for connection in connections:
+            connection.recv()
+
+    def runcount(self, stopcount):
+        """Runs the islands up to a given number of generations.
+        Returns the (island, generation) that found the target, or (None, stopcount)."""
+        islandseeds = spawn(self.seed, self.islands + 1)
+        rng = pythonrandom(islandseeds[-1])
+        connections = list()
+        processes = list()
+        for island in range(self.islands):
+            connection, workerconnection = Pipe()
+            process = Process(target=islandworker, args=(
+                workerconnection, self.target, self.mutationrate, self.population,
+                islandseeds[island]))
+            process.daemon = True
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+
+        winner = (None, stopcount)
+        try:
+            generation = 1
+            while generation < stopcount:
+                steps = min(self.interval, stopcount - generation)
+                for connection in connections:
+                    connection.send(('evolve', steps))
+                reports = [connection.recv() for connection in connections]
+                found = [(report[1], island) for island, report in enumerate(reports) if report[0]]
+                if found:
+                    #The earliest generation wins, ties go to the lowest island
+                    foundgeneration, island = min(found)
+                    winner = (island, foundgeneration)
+                    break
+                generation += steps
+                #A single island has nobody to trade with
+                if self.islands > 1:
+                    self.migrate(connections, rng)
+        finally:
+            for connection in connections:
+                connection.send(('stop', None))
+            for process in processes:
+                process.join()
+        return winner
+
+    ##THE MAIN SCRIPT##
+    def run(self, stopcount):
+        """Runs the islands and reports which one found the target"""
+        start_time = time.time()
+        island, generation = self.runcount(stopcount)
+        print('')
+        if island is None:
+            print('\tNo island found \'{}\' in {} generations.'.format(self.target, stopcount))
+        else:
+            print('\tIsland {} found \'{}\' after {} generations.'.format(island, self.target, generation))
+        print('\t{} islands of {} individuals, {} migrants every {} generations.'.format(
+            self.islands, self.population, self.migrants, self.interval))
+        print('\tIt took {} seconds.'.format(time.time() - start_time))
+        return island, generation
+
+
+#Launch the program
+if __name__ == '__main__':
+    IslandModel('to be or not to be', 5, 100, 4).run(1000)
@@ -0,0 +1,61 @@
+﻿"""Score statistics of a generation, kept up to date as its individuals are created.
+
+The populations add every child to a PopulationStats as soon as it is scored, so the
+best individual, the total score and the score list the selection is built from are
+ready when the generation is complete, without scanning the population again."""
+import heapq
+
+
+class PopulationStats(object):
+    """Best, top-k, sum, list and histogram of the scores of one generation.
+    Individuals are anything with a score attribute; ids are their insertion order."""
+
+    def __init__(self, topk=1):
+        self.topk = topk
+        self.count = 0
+        self.totalscore = 0
+        self.bestscore = -1
+        self.bestid = -1
+        self.best = None
+        self.scores = list()
+        #Score -> number of individuals with it
+        self.histogram = dict()
+        #Min-heap of the topk (score, -id, individual): the id breaks ties in insertion order
+        self.heap = list()
+
+    @classmethod
+    def of(cls, elements, topk=1):
+        """Returns the statistics of a whole list of individuals"""
+        stats = cls(topk)
+        for element in elements:
+            stats.add(element)
+        return stats
+
+    def add(self, element):
+        """Adds the next individual of the generation"""
+        score = element.score
+        self.scores.append(score)
+        self.totalscore += score
+        self.histogram[score] = self.histogram.get(score, 0) + 1
+        #Strictly greater: the first of the best individuals is the best
+        if score > self.bestscore:
+            self.bestscore = score
+            self.bestid = self.count
+            self.best = element
+        if self.topk > 1:
+            entry = (score, -self.count, element)
+            if len(self.heap) < self.topk:
+                heapq.heappush(self.heap, entry)
+            elif entry[:2] > self.heap[0][:2]:
+                heapq.heapreplace(self.heap, entry)
+        self.count += 1
+
+    def top(self):
+        """Returns the topk best individuals, best first"""
+        if self.topk <= 1:
+            return [self.best] if self.best is not None else []
+        return [element for score, negativeid, element in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def mean(self):
+        """Returns the mean score"""
+        return self.totalscore / self.count if self.count else 0
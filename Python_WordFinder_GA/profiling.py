@@ -0,0 +1,134 @@
+﻿"""Per-generation profiling of the genetic algorithm populations.
+
+Every Population lists its hook points in a profilehooks class attribute: the methods
+(or attributes of its random streams, like 'randompool.uniforms') behind selection,
+crossover, mutation, fitness evaluation, random draws and the whole generation.
+A Profiler attached to a population shadows those methods on that instance only with
+timed wrappers, so a population with no profiler attached runs the plain methods with
+no overhead at all:
+
+    profiler = Profiler()
+    profiler.attach(population)
+    population.runcount(100)
+    report = profiler.report()
+
+Times are inclusive: crossmutation contains crossover, which contains its draws."""
+import time
+import tracemalloc
+
+
+class Profiler(object):
+    """Counts calls, nanoseconds and items (length of list results, 1 otherwise)
+    of every hooked section, one record per generation."""
+
+    #Hooked section that closes a generation record when it returns
+    GENERATION = 'generation'
+
+    def __init__(self, allocations=False):
+        #Tracing allocations with tracemalloc is slow: only on request
+        self.allocations = allocations
+        self.generations = list()
+        self.current = dict()
+        self.hooks = list()
+
+    def counter(self, section):
+        """Returns the [calls, ns, items] counter of a section in the current generation"""
+        counter = self.current.get(section)
+        if counter is None:
+            counter = self.current[section] = [0, 0, 0]
+        return counter
+
+    def wrap(self, section, function):
+        """Returns function timed and counted under section"""
+        clock = time.perf_counter_ns
+        profiler = self
+        closes = section == self.GENERATION
+
+        def hooked(*args, **kwargs):
+            start = clock()
+            result = function(*args, **kwargs)
+            elapsed = clock() - start
+            counter = profiler.counter(section)
+            counter[0] += 1
+            counter[1] += elapsed
+            counter[2] += len(result) if type(result) is list else 1
+            if closes:
+                profiler.closegeneration()
+            return result
+        return hooked
+
+    def attach(self, population):
+        """Hooks the profilehooks of a population instance"""
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        for section, paths in population.profilehooks.items():
+            for path in paths:
+                names = path.split('.')
+                owner = population
+                for name in names[:-1]:
+                    owner = getattr(owner, name)
+                name = names[-1]
+                #Methods come from the class, plain attributes have to be put back on detach
+                original = vars(owner).get(name)
+                self.hooks.append((owner, name, original))
+                setattr(owner, name, self.wrap(section, getattr(owner, name)))
+
+    def detach(self):
+        """Removes the hooks: the populations run the plain methods again"""
+        for owner, name, original in reversed(self.hooks):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.hooks = list()
+        if self.allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def closegeneration(self):
+        """Stores the counters of the generation that just finished"""
+        record = {'generation': len(self.generations) + 1, 'sections': dict()}
+        for section, (calls, ns, items) in self.current.items():
+            record['sections'][section] = {'calls': calls, 'ns': ns, 'items': items}
+        if self.allocations and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record['allocated_bytes'] = current
+            record['peak_bytes'] = peak
+            tracemalloc.reset_peak()
+        self.generations.append(record)
+        self.current = dict()
+
+    def report(self):
+        """Returns the per-generation records and the totals of every section as a dict
+        ready for json.dump"""
+        totals = dict()
+        for record in self.generations:
+            for section, counts in record['sections'].items():
+                total = totals.setdefault(section, {'calls': 0, 'ns': 0, 'items': 0})
+                for key in total:
+                    total[key] += counts[key]
+        for total in totals.values():
+            total['ns_per_call'] = total['ns'] / total['calls'] if total['calls'] else 0
+        return {'generations': self.generations, 'totals': totals}
+
+    def printreport(self):
+        """Prints the totals of every section"""
+        totals = self.report()['totals']
+        print('')
+        print('\t{:<14}{:>10}{:>14}{:>12}{:>14}'.format('Section', 'Calls', 'Items', 'ms', 'ns/call'))
+        print('\t---------------------------------------------------------------')
+        for section, total in sorted(totals.items(), key=lambda item: -item[1]['ns']):
+            print('\t{:<14}{calls:>10}{items:>14}{:>12.1f}{ns_per_call:>14.0f}'.format(
+                section, total['ns'] / 1e6, **total))
+        print('\t{} generations.'.format(len(self.generations)))
+
+
+#Launch the program
+if __name__ == '__main__':
+    import wordfinder_ga
+
+    population = wordfinder_ga.Population('to be or not to be', 5, 100, seed=2018)
+    profiler = Profiler()
+    profiler.attach(population)
+    population.runcount(200)
+    profiler.detach()
+    profiler.printreport()
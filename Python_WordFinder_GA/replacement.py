@@ -0,0 +1,99 @@
+﻿"""Replacement strategies of wordfinder_ga.Population.
+
+By default every generation replaces the whole population with new children. A
+replacement strategy decides instead which individuals survive: survivors keep their
+score, so only the new children are evaluated. Strategies keep no state of their own,
+the population's ScoreIndex lives on the population, so the same strategy object can be
+shared by every run of a sweep."""
+import bisect
+
+
+class ScoreIndex(object):
+    """Individuals kept sorted by score, worst first, with their total score.
+    The best and the worst individuals are found without scanning the population."""
+
+    def __init__(self, elements):
+        self.elements = sorted(elements, key=lambda element: element.score)
+        self.scores = [element.score for element in self.elements]
+        self.totalscore = sum(self.scores)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def best(self):
+        """Returns the individual with the highest score"""
+        return self.elements[-1]
+
+    def top(self, count):
+        """Returns the count best individuals"""
+        return self.elements[len(self.elements) - count:]
+
+    def removeworst(self, count):
+        """Removes the count worst individuals"""
+        self.totalscore -= sum(self.scores[:count])
+        del self.elements[:count]
+        del self.scores[:count]
+
+    def insert(self, element):
+        """Adds an individual at its place in the order"""
+        position = bisect.bisect_right(self.scores, element.score)
+        self.scores.insert(position, element.score)
+        self.elements.insert(position, element)
+        self.totalscore += element.score
+
+
+class Replacement(object):
+    """Base class for the replacement strategies."""
+
+    def replace(self, population):
+        """Returns the next population list of a Population"""
+        raise NotImplementedError
+
+    @staticmethod
+    def scoreindex(population):
+        """Returns the population's ScoreIndex, built on first use"""
+        if population.scoreindex is None:
+            population.scoreindex = ScoreIndex(population.populationlist)
+        return population.scoreindex
+
+    @staticmethod
+    def children(population, count, index):
+        """Returns count new children of the individuals of a ScoreIndex"""
+        #The index is sorted: its best individual is the last one
+        return population.makechildren(
+            population.target, len(population.target), population.mutationrate,
+            count, index.elements, index.totalscore, len(index) - 1, index.scores)
+
+
+class Elitism(Replacement):
+    """The elites best individuals survive unchanged, the rest are new children."""
+
+    def __init__(self, elites=1):
+        self.elites = elites
+
+    def replace(self, population):
+        index = self.scoreindex(population)
+        count = len(index) - self.elites
+        children = self.children(population, count, index)
+        #Only the elites stay in the index, the children take their place in the order
+        index.removeworst(count)
+        for child in children:
+            index.insert(child)
+        return list(index.elements)
+
+
+class SteadyState(Replacement):
+    """Every step only the worst fraction of the population is replaced by new children."""
+
+    def __init__(self, fraction=0.1):
+        self.fraction = fraction
+
+    def replace(self, population):
+        index = self.scoreindex(population)
+        count = max(1, int(round(self.fraction * len(index))))
+        #Parents come from the whole population, the worst included, before they are removed
+        children = self.children(population, count, index)
+        index.removeworst(count)
+        for child in children:
+            index.insert(child)
+        return list(index.elements)
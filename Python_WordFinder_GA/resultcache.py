@@ -0,0 +1,150 @@
+﻿"""Persistent cache of simulation runs shared by the PopulationMap sweeps.
+
+Every seeded run is stored in a SQLite file under a key made of the engine, its version
+and every parameter of the run, seed included. Re-running or extending a grid only
+computes the runs that are not in the cache yet. Unseeded runs are never cached: they
+are a fresh random draw every time.
+
+Engines carry cachename and version class attributes. The name keeps the key the same
+whether the engine's module is imported or run as a script; bump the version whenever a
+change to the engine alters the results of a seeded run, so the runs of the old version
+stop matching."""
+import hashlib
+import json
+import marshal
+import sqlite3
+import time
+
+import numpy as np
+
+
+def codehash(function):
+    """Returns a hash of the code, default arguments and closure of a function.
+    Builtins have no code to hash: None"""
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return None
+    digest = hashlib.sha1(marshal.dumps(code))
+    for item in (function.__defaults__ or ()) + tuple(
+            cell.cell_contents for cell in function.__closure__ or ()):
+        digest.update(repr(keypart(item)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def keypart(value):
+    """Returns a JSON-ready form of one run parameter"""
+    if isinstance(value, np.random.SeedSequence):
+        return ['seed', value.entropy, list(value.spawn_key)]
+    if isinstance(value, (list, tuple)):
+        return [keypart(item) for item in value]
+    if isinstance(value, type):
+        #Only a name set on the class itself: subclasses don't share their parent's runs
+        name = vars(value).get('cachename') or '{}.{}'.format(value.__module__, value.__qualname__)
+        return '{}:{}'.format(name, getattr(value, 'version', 0))
+    if callable(value) and hasattr(value, '__qualname__'):
+        #Functions like user-supplied fitnesses: their name and a hash of their code
+        return ['function', '{}.{}'.format(value.__module__, value.__qualname__), codehash(value)]
+    if hasattr(value, '__dict__'):
+        #Stop policies and the like: their class and settings
+        return [type(value).__name__, {name: keypart(item) for name, item in sorted(vars(value).items())}]
+    return value
+
+
+class ResultCache(object):
+    """LRU cache of (generations, stop reason) per run in a SQLite file.
+    Once it holds more than maxentries runs or maxbytes of keys and values,
+    the least recently used runs are evicted."""
+
+    #New runs are saved and the cache trimmed every so many runs and on close
+    commitevery = 100
+
+    def __init__(self, filename='results.sqlite', maxentries=1000000, maxbytes=None):
+        self.filename = filename
+        self.maxentries = maxentries
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.pending = 0
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS runs (key TEXT PRIMARY KEY, generations REAL, '
+            'reason TEXT, size INTEGER, lastused REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS runs_lastused ON runs (lastused)')
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @staticmethod
+    def key(engine, seed, *parameters):
+        """Returns the key of a run of an engine class with its seed and parameters.
+        Returns None for unseeded runs, which can't be cached."""
+        if seed is None:
+            return None
+        return json.dumps([keypart(engine), keypart(seed)] + keypart(parameters),
+                          separators=(',', ':'))
+
+    def get(self, key):
+        """Returns the (generations, reason) of a cached run or None"""
+        if key is None:
+            return None
+        row = self.connection.execute(
+            'SELECT generations, reason FROM runs WHERE key = ?', (key, )).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute('UPDATE runs SET lastused = ? WHERE key = ?', (time.time(), key))
+        generations, reason = row
+        #Generation counts are stored as REAL: give back ints as ints
+        if generations == int(generations):
+            generations = int(generations)
+        return generations, reason
+
+    def put(self, key, generations, reason=None):
+        """Stores the result of a run"""
+        if key is None:
+            return
+        size = len(key) + len(reason or '') + 16
+        self.connection.execute(
+            'INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)',
+            (key, generations, reason, size, time.time()))
+        self.pending += 1
+        if self.pending >= self.commitevery:
+            self.commit()
+
+    def commit(self):
+        """Evicts the oldest runs when the cache is full and saves it"""
+        self.evict()
+        self.connection.commit()
+        self.pending = 0
+
+    def evict(self):
+        """Removes the least recently used runs over maxentries or maxbytes"""
+        if self.maxentries is not None:
+            self.connection.execute(
+                'DELETE FROM runs WHERE key IN (SELECT key FROM runs ORDER BY lastused DESC '
+                'LIMIT -1 OFFSET ?)', (self.maxentries, ))
+        if self.maxbytes is not None:
+            total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM runs').fetchone()[0]
+            if total > self.maxbytes:
+                excess = total - self.maxbytes
+                freed = 0
+                oldest = list()
+                for key, size in self.connection.execute('SELECT key, size FROM runs ORDER BY lastused'):
+                    if freed >= excess:
+                        break
+                    oldest.append((key, ))
+                    freed += size
+                self.connection.executemany('DELETE FROM runs WHERE key = ?', oldest)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def close(self):
+        """Saves the cache and closes the file"""
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,249 @@
+﻿"""Output of the PopulationMap simulation grids.
+
+The grid averages go to ;-separated text. The raw runs behind them can also be kept in
+a binary columnar store: a directory with one flat file per column that new runs are
+appended to, read back as memory-mapped NumPy arrays."""
+import json
+import os
+
+import numpy as np
+
+
+class ResultsWriter(object):
+    """Streams a population x mutation rate grid to a ;-separated file.
+    Cells are written in grid order and flushed as soon as they are finished,
+    so a crashed sweep keeps everything it already computed.
+    In resume mode the cells already in the file are kept and reported as done, as long
+    as the file starts with the same header lines: the header identifies the sweep."""
+
+    def __init__(self, populations, mutationrates, header=None, filename='data.csv', resume=False):
+        self.filename = filename
+        self.header = header
+        self.populations = list(populations)
+        self.mutationrates = list(mutationrates)
+        self.cells = [(population, mutationrate)
+                      for population in self.populations for mutationrate in self.mutationrates]
+        #Finished cells waiting for an earlier cell before they can be written
+        self.pending = dict()
+        self.finished = dict()
+        if resume and os.path.exists(filename):
+            self.finished = self.readcells()
+        self.nextcell = len(self.finished)
+
+        #The file is rebuilt from the cells it already had so a half-written value is dropped
+        self.fileobj = open(filename, 'w')
+        if header is not None:
+            self.fileobj.write(header + '\n')
+        for i, cell in enumerate(self.cells[:self.nextcell]):
+            self.writecell(i, cell, self.finished[cell])
+        self.fileobj.flush()
+
+    def readcells(self):
+        """Returns the values of the cells already written, in grid order"""
+        fileobj = open(self.filename, 'r')
+        try:
+            lines = fileobj.read().split('\n')
+        finally:
+            fileobj.close()
+        if self.header is not None:
+            #A file without the same header belongs to another sweep
+            headerlines = self.header.split('\n')
+            if lines[:len(headerlines)] != headerlines:
+                return dict()
+            lines = lines[len(headerlines):]
+
+        finished = dict()
+        columns = len(self.mutationrates)
+        for population, line in zip(self.populations, lines):
+            #Only values closed by ';' were completely written
+            values = line.split(';')[:-1]
+            if not values or values[0] != str(population):
+                break
+            for mutationrate, value in zip(self.mutationrates, values[1:]):
+                finished[(population, mutationrate)] = value
+            if len(values) - 1 < columns:
+                break
+        return finished
+
+    def done(self, cell):
+        """Tells whether a (population, mutation rate) cell is already on file"""
+        return cell in self.finished
+
+    def writecell(self, i, cell, value):
+        """Writes the i-th cell of the grid, opening and closing its row when needed"""
+        columns = len(self.mutationrates)
+        if i % columns == 0:
+            #Left column: each studied population
+            self.fileobj.write('{};'.format(cell[0]))
+        self.fileobj.write('{};'.format(value))
+        if i % columns == columns - 1:
+            self.fileobj.write('\n')
+
+    def write(self, cell, value):
+        """Stores a finished cell and flushes every cell that can be written in order"""
+        self.pending[cell] = value
+        while self.nextcell < len(self.cells) and self.cells[self.nextcell] in self.pending:
+            nextcell = self.cells[self.nextcell]
+            self.finished[nextcell] = self.pending.pop(nextcell)
+            self.writecell(self.nextcell, nextcell, self.finished[nextcell])
+            self.nextcell += 1
+        self.fileobj.flush()
+
+    def close(self):
+        """Closes the output file"""
+        self.fileobj.close()
+
+
+def writestats(stats, filename='data_stats.csv'):
+    """Writes the (mean, std, n) of every (population, mutation rate) cell, one cell per row"""
+    fileobj = open(filename, 'w')
+    try:
+        fileobj.write('population;mutation rate;mean;std;n\n')
+        for (population, mutationrate), (mean, std, n) in sorted(stats.items()):
+            fileobj.write('{};{};{};{};{}\n'.format(population, mutationrate, mean, std, n))
+    finally:
+        fileobj.close()
+
+
+class RunsWriter(object):
+    """Appends every run of a sweep to a columnar store: one raw binary file per column
+    and a columns.json with their dtypes, the root seed of the sweep and the stop reasons.
+    The seed key columns hold the (population id, mutation rate id, iteration) the seed of
+    the run was derived from with rngstreams.cellseed, -1 for unseeded runs.
+    seconds is NaN for runs that came from a result cache.
+    A store holds the runs of one root seed: resuming it with another one raises ValueError."""
+
+    COLUMNS = (('population', '<i8'), ('mutationrate', '<f8'),
+               ('populationid', '<i8'), ('mutationrateid', '<i8'), ('iteration', '<i8'),
+               ('generations', '<i8'), ('seconds', '<f8'), ('reason', '<i2'))
+
+    #Rows kept in memory before they are appended to the column files
+    bufferrows = 4096
+
+    def __init__(self, dirname='data.runs', rootseed=None, resume=False):
+        self.dirname = dirname
+        self.reasons = list()
+        self.rows = list()
+        if isinstance(rootseed, np.random.SeedSequence):
+            rootseed = rootseed.entropy
+        self.rootseed = rootseed
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        metadata = os.path.join(dirname, 'columns.json')
+        if resume and os.path.exists(metadata):
+            with open(metadata, 'r') as fileobj:
+                stored = json.load(fileobj)
+            #Seed keys only rebuild the seeds of runs under the store's root seed
+            if stored['rootseed'] != rootseed:
+                raise ValueError('{} holds the runs of root seed {}, not {}'.format(
+                    dirname, stored['rootseed'], rootseed))
+            self.reasons = stored['reasons']
+        mode = 'ab' if resume else 'wb'
+        self.files = [open(os.path.join(dirname, name + '.bin'), mode) for name, dtype in self.COLUMNS]
+        self.writemetadata()
+
+    def writemetadata(self):
+        """Writes the description of the columns"""
+        metadata = {'columns': [list(column) for column in self.COLUMNS],
+                    'rootseed': self.rootseed, 'reasons': self.reasons}
+        with open(os.path.join(self.dirname, 'columns.json'), 'w') as fileobj:
+            json.dump(metadata, fileobj, indent=2)
+
+    def append(self, cell, seedkey, generations, seconds, reason):
+        """Stores one run of a (population, mutation rate) cell"""
+        if reason not in self.reasons:
+            self.reasons.append(reason)
+        self.rows.append(tuple(cell) + tuple(seedkey or (-1, -1, -1)) +
+                         (generations, seconds, self.reasons.index(reason)))
+        if len(self.rows) >= self.bufferrows:
+            self.flush()
+
+    def flush(self):
+        """Appends the buffered runs to the column files"""
+        if self.rows:
+            for (name, dtype), fileobj, values in zip(self.COLUMNS, self.files, zip(*self.rows)):
+                fileobj.write(np.array(values, dtype=dtype).tobytes())
+                fileobj.flush()
+            self.rows = list()
+        self.writemetadata()
+
+    def close(self):
+        """Saves the buffered runs and closes the column files"""
+        self.flush()
+        for fileobj in self.files:
+            fileobj.close()
+
+
+class RunsReader(object):
+    """Reads a RunsWriter store. Every column is a read-only np.memmap: runs['generations']"""
+
+    def __init__(self, dirname='data.runs'):
+        self.dirname = dirname
+        with open(os.path.join(dirname, 'columns.json'), 'r') as fileobj:
+            metadata = json.load(fileobj)
+        self.rootseed = metadata['rootseed']
+        self.reasons = metadata['reasons']
+        self.columns = dict()
+        for name, dtype in metadata['columns']:
+            filename = os.path.join(dirname, name + '.bin')
+            if os.path.getsize(filename):
+                self.columns[name] = np.memmap(filename, dtype=dtype, mode='r')
+            else:
+                #np.memmap can't map an empty file
+                self.columns[name] = np.zeros(0, dtype=dtype)
+        #A crash can leave columns one write apart: only whole rows are read
+        rows = min(len(column) for column in self.columns.values())
+        for name in self.columns:
+            self.columns[name] = self.columns[name][:rows]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.columns['generations'])
+
+    def uniquerows(self):
+        """Returns the ids of the rows of distinct runs, in order.
+        A seeded run is stored again when it is replayed from a result cache or a resumed
+        sweep runs it again: only its last row is kept. Unseeded runs are all distinct."""
+        last = dict()
+        unseeded = list()
+        keys = zip(self['population'].tolist(), self['mutationrate'].tolist(),
+                   self['populationid'].tolist(), self['mutationrateid'].tolist(),
+                   self['iteration'].tolist())
+        for row, key in enumerate(keys):
+            if key[4] < 0:
+                unseeded.append(row)
+            else:
+                last[key] = row
+        return sorted(unseeded + list(last.values()))
+
+    def duplicates(self):
+        """Returns the number of rows that repeat an earlier seeded run"""
+        return len(self) - len(self.uniquerows())
+
+    def cells(self):
+        """Returns the generations of the distinct runs of every (population, mutation rate) cell"""
+        rows = self.uniquerows()
+        cells = dict()
+        for population, mutationrate, generations in zip(
+                self['population'][rows].tolist(), self['mutationrate'][rows].tolist(),
+                self['generations'][rows].tolist()):
+            cells.setdefault((population, mutationrate), list()).append(generations)
+        return cells
+
+    def exportcsv(self, filename='data.csv', header=None, decimal='.'):
+        """Writes the average generations of every cell in the layout of ResultsWriter.
+        decimal=',' gives the comma decimals of spreadsheets in some locales."""
+        cells = self.cells()
+        populations = sorted(set(population for population, mutationrate in cells))
+        mutationrates = sorted(set(mutationrate for population, mutationrate in cells))
+        writer = ResultsWriter(populations, mutationrates, header, filename)
+        try:
+            for population in populations:
+                for mutationrate in mutationrates:
+                    runs = cells.get((population, mutationrate))
+                    value = sum(runs) / len(runs) if runs else ''
+                    writer.write((population, mutationrate), str(value).replace('.', decimal))
+        finally:
+            writer.close()
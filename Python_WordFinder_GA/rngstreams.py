@@ -0,0 +1,74 @@
+﻿"""Seeded random number streams for reproducible simulations.
+
+Every Population owns its own generators instead of sharing the global random and
+np.random states. Sweeps derive the seed of every run from a root seed and the run's
+coordinates in the grid, so results don't depend on the order runs are executed in,
+whether serially, on threads or on processes."""
+import random
+
+import numpy as np
+
+
+def seedsequence(seed=None):
+    """Returns a SeedSequence from None (fresh entropy), an int or a SeedSequence"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def spawn(seed, count):
+    """Returns count independent child seeds of a given seed"""
+    return seedsequence(seed).spawn(count)
+
+
+def cellseed(rootseed, *key):
+    """Returns the seed of one run from the root seed of a sweep and non-negative integer
+    coordinates, e.g. (population, mutation rate index, iteration).
+    None means an unseeded run."""
+    if rootseed is None:
+        return None
+    return np.random.SeedSequence(rootseed, spawn_key=key)
+
+
+def pythonrandom(seed=None):
+    """Returns a random.Random stream: fastest for per-gene scalar draws"""
+    state = seedsequence(seed).generate_state(4, np.uint64)
+    return random.Random(int.from_bytes(state.tobytes(), 'little'))
+
+
+def numpyrandom(seed=None):
+    """Returns a NumPy Generator stream: for draws of whole arrays"""
+    return np.random.default_rng(seedsequence(seed))
+
+
+class RandomPool(object):
+    """Hands out random numbers pre-drawn in large blocks from a NumPy Generator.
+    Crossover and mutation kernels take whole lists of draws from it instead of
+    calling the random stream once per gene."""
+
+    def __init__(self, generator, blocksize=65536):
+        self.generator = generator
+        self.blocksize = blocksize
+        self.buffer = list()
+        self.position = 0
+
+    def reserve(self, count):
+        """Makes sure the next count draws are already in the buffer,
+        so a whole generation is drawn in a single block"""
+        remaining = len(self.buffer) - self.position
+        if remaining < count:
+            block = self.generator.random(max(self.blocksize, count - remaining)).tolist()
+            self.buffer = self.buffer[self.position:] + block
+            self.position = 0
+
+    def uniforms(self, count):
+        """Returns a list of count uniform random numbers in [0, 1)"""
+        self.reserve(count)
+        start = self.position
+        self.position += count
+        return self.buffer[start:self.position]
+
+    def integers(self, low, high, count):
+        """Returns a list of count random integers from low (inclusive) to high (exclusive)"""
+        span = high - low
+        return [low + int(draw * span) for draw in self.uniforms(count)]
@@ -0,0 +1,172 @@
+﻿"""Parent selection helpers shared by the genetic algorithm populations.
+
+Every selection is built once per generation from the generation's scores and a
+random stream (the random module or a random.Random) and then answers parent draws
+through pick() and pickpairs(count)."""
+import bisect
+import itertools
+import random
+import time
+
+
+class Selection(object):
+    """Base class for the selection strategies."""
+
+    def pick(self):
+        """Returns a random parent id"""
+        raise NotImplementedError
+
+    def pickpairs(self, count):
+        """Returns a list of count (id_a, id_b) parent pairs. Both parents of a pair
+        are forced to be different, so it needs 2 or more ids with score > 0."""
+        pick = self.pick
+        pairs = list()
+        for _ in range(count):
+            parent_id_a = pick()
+            parent_id_b = pick()
+            while parent_id_a == parent_id_b:
+                parent_id_b = pick()
+            pairs.append((parent_id_a, parent_id_b))
+        return pairs
+
+
+class CumulativeScoreIndex(Selection):
+    """Roulette wheel selection over the prefix sums of a generation's scores.
+    Every draw is a binary search."""
+
+    def __init__(self, scores, rng=random):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(scores))
+        self.totalscore = self.cumulative[-1] if self.cumulative else 0
+
+    def pick(self):
+        """Returns a random id with probability pi / (p1 + p2 + ... + pn)
+        with p being its score."""
+        #Same draw as the old linear walk: first id whose cumulative score reaches the mark
+        return bisect.bisect_left(self.cumulative, self.rng.randint(0, self.totalscore))
+
+
+class AliasTable(Selection):
+    """Roulette wheel selection with Walker's alias method.
+    Setup is O(n) and every draw is O(1)."""
+
+    def __init__(self, scores, rng=random):
+        self.rng = rng
+        count = len(scores)
+        totalscore = sum(scores)
+        self.count = count
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+        #Scaled scores average 1: small ones are topped up by the large ones
+        scaled = [score * count / totalscore for score in scores]
+        small = [i for i, value in enumerate(scaled) if value < 1]
+        large = [i for i, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            small_id = small.pop()
+            large_id = large.pop()
+            self.probability[small_id] = scaled[small_id]
+            self.alias[small_id] = large_id
+            scaled[large_id] += scaled[small_id] - 1
+            if scaled[large_id] < 1:
+                small.append(large_id)
+            else:
+                large.append(large_id)
+
+    def pick(self):
+        """Returns a random id with probability pi / (p1 + p2 + ... + pn)
+        with p being its score."""
+        column = self.rng.randrange(self.count)
+        if self.rng.random() < self.probability[column]:
+            return column
+        return self.alias[column]
+
+
+class StochasticUniversalSampling(CumulativeScoreIndex):
+    """Draws all the parents of a generation in a single pass over the prefix sums
+    using evenly spaced marks with one random offset."""
+
+    def pickpairs(self, count):
+        """Returns a list of count (id_a, id_b) parent pairs. Both parents of a pair
+        are forced to be different, so it needs 2 or more ids with score > 0."""
+        draws = 2 * count
+        step = self.totalscore / draws
+        mark = self.rng.uniform(0, step)
+        lastid = len(self.cumulative) - 1
+        position = 0
+        parent_ids = list()
+        for _ in range(draws):
+            while position < lastid and self.cumulative[position] < mark:
+                position += 1
+            parent_ids.append(position)
+            mark += step
+        #Marks come out sorted: shuffle them so couples are random
+        self.rng.shuffle(parent_ids)
+        parents_a = parent_ids[:count]
+        parents_b = parent_ids[count:]
+        for i in range(count):
+            if parents_a[i] != parents_b[i]:
+                continue
+            #Swaps with another couple when both stay valid, otherwise draws again
+            for _ in range(3):
+                j = self.rng.randrange(count)
+                if parents_b[j] != parents_a[i] and parents_b[i] != parents_a[j]:
+                    parents_b[i], parents_b[j] = parents_b[j], parents_b[i]
+                    break
+            while parents_a[i] == parents_b[i]:
+                parents_b[i] = self.pick()
+        return list(zip(parents_a, parents_b))
+
+
+class TournamentSelection(Selection):
+    """Picks the fittest of size random individuals. Only score order matters,
+    so it also works when every score is 0."""
+
+    def __init__(self, scores, rng=random, size=2):
+        self.rng = rng
+        self.scores = list(scores)
+        self.count = len(self.scores)
+        self.size = size
+
+    def pick(self):
+        """Returns the id of the best individual in a random tournament"""
+        count = self.count
+        randrange = self.rng.randrange
+        contenders = [randrange(count) for _ in range(self.size)]
+        return max(contenders, key=self.scores.__getitem__)
+
+
+#Benchmark
+def benchmark(population_size, length=10, generations=5):
+    """Times every selection drawing a full generation of parent pairs against
+    the per-child np.random.choice path of wordfinder_ga_threading"""
+    import numpy as np
+
+    scores = [2**random.randint(0, length) for _ in range(population_size)]
+    elements = list(range(population_size))
+    timings = dict()
+
+    start_time = time.time()
+    for _ in range(generations):
+        totalscore = sum(scores)
+        probabilities = [score / totalscore for score in scores]
+        for _ in range(population_size):
+            np.random.choice(elements, 2, False, probabilities)
+    timings['np.random.choice'] = time.time() - start_time
+
+    for selection in (CumulativeScoreIndex, AliasTable,
+                      StochasticUniversalSampling, TournamentSelection):
+        start_time = time.time()
+        for _ in range(generations):
+            selection(scores).pickpairs(population_size)
+        timings[selection.__name__] = time.time() - start_time
+
+    print('\tSelection of {} pairs x {} generations'.format(population_size, generations))
+    for name, seconds in timings.items():
+        print('\t{:<30}{:.4f} seconds'.format(name, seconds))
+    return timings
+
+
+#Launch the benchmark
+if __name__ == '__main__':
+    for size in (100, 1000, 5000):
+        benchmark(size)
@@ -0,0 +1,151 @@
+﻿"""Shared-memory population for running a single large simulation on several processes.
+
+The gene matrix and the fitness values live in a multiprocessing.shared_memory block
+holding two generations. Every generation the parents are picked in the main process,
+then worker processes build one chunk of children each, reading the current generation
+and writing straight into the next one. Only parent ids and seeds are pickled."""
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from fitness import getfitness
+from rngstreams import seedsequence
+from variation import getvariation
+from wordfinder_ga import LongPopulation
+
+
+class SharedGeneStore(object):
+    """Two generations of genes and fitness values in one shared memory block."""
+
+    def __init__(self, population, length, name=None):
+        self.shape = (population, length)
+        genesize = 2 * population * length
+        #Match counts start on an 8-byte boundary
+        self.matchoffset = (genesize + 7) // 8 * 8
+        size = self.matchoffset + 2 * population * 8
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        buffer = self.memory.buf
+        self.genes = np.ndarray((2, population, length), dtype=np.uint8, buffer=buffer)
+        self.matches = np.ndarray((2, population), dtype=np.int64, buffer=buffer,
+                                  offset=self.matchoffset)
+
+    def close(self):
+        """Detaches from the block. The process that created it also frees it."""
+        #Views have to go before the buffer can be released
+        del self.genes
+        del self.matches
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+#Worker process state, set once by attachworker
+WORKER = dict()
+
+
+def attachworker(name, population, length, targetgenes, fitness, variation):
+    """Pool initializer: attaches the worker to the shared gene store"""
+    WORKER['store'] = SharedGeneStore(population, length, name)
+    WORKER['targetgenes'] = targetgenes
+    WORKER['fitness'] = fitness
+    WORKER['variation'] = variation
+
+
+def buildchunk(task):
+    """Builds one chunk of children of the next generation straight into shared memory"""
+    current, start, stop, parents_a, parents_b, ratio, mutationrate, seed = task
+    store = WORKER['store']
+    store.matches[1 - current, start:stop] = LongPopulation.buildchildren(
+        store.genes[current], store.genes[1 - current, start:stop],
+        parents_a, parents_b, ratio, mutationrate, WORKER['targetgenes'],
+        np.random.default_rng(seed), WORKER['fitness'], WORKER['variation'])
+
+
+class SharedPopulation(LongPopulation):
+    """LongPopulation whose generations are built by a pool of worker processes
+    on shared-memory gene buffers. It holds a process pool and a shared memory block:
+    use it in a with block or call close() when done."""
+    cachename = 'sharedmemory.SharedPopulation'
+
+    #About 64k genes per task so every worker gets several chunks of a generation.
+    #Chunks depend on the sizes only: results don't depend on the number of workers
+    chunkgenes = 1 << 16
+
+    #Constructor
+    def __init__(self, target, mutationrate, population, seed=None, workers=None,
+                 fitness='exact', variation='newchars'):
+        self.target = target
+        self.mutationrate = mutationrate
+        self.population = population
+        #Selection draws stay in this process, chunk seeds are spawned every generation
+        self.seedsequence = seedsequence(seed)
+        selectionseed, initseed = self.seedsequence.spawn(2)
+        self.rng = np.random.default_rng(selectionseed)
+        self.fitness = getfitness(fitness)
+        self.variation = getvariation(variation)
+        self.targetgenes = np.frombuffer(target.encode('latin-1'), dtype=np.uint8)
+        self.targetvalue = self.fitness.targetvalue(self.targetgenes)
+        self.targetscore = self.targetvalue
+
+        self.store = SharedGeneStore(population, len(target))
+        self.current = 0
+        self.genes = self.store.genes[0]
+        self.nextgenes = self.store.genes[1]
+        initrng = np.random.default_rng(initseed)
+        for rows in self.chunks():
+            self.genes[rows] = self.variation.batchnewchars(
+                (rows.stop - rows.start, len(target)), initrng)
+            self.store.matches[0, rows] = self.fitness.batchvalues(
+                self.targetgenes, self.genes[rows])
+        self.matches = self.store.matches[0]
+
+        self.pool = Pool(workers, attachworker,
+                         (self.store.name, population, len(target), self.targetgenes,
+                          self.fitness, self.variation))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            del self.genes
+            del self.nextgenes
+            del self.matches
+            self.store.close()
+
+    ##GENETIC ENGINE##
+
+    def newgeneration(self):
+        """Builds the next generation on the worker processes and swaps the buffers."""
+        scores = self.fitness.selectionweights(self.matches)
+        parents_a, parents_b = self.pickparents(scores)
+        ratio = self.fitness.parentratio(self.matches[parents_a], self.matches[parents_b])
+        chunks = list(self.chunks())
+        #Chunks depend on the sizes only, so results don't depend on the number of workers
+        seeds = self.seedsequence.spawn(len(chunks))
+        tasks = [(self.current, rows.start, rows.stop, parents_a[rows], parents_b[rows],
+                  ratio[rows], self.mutationrate, seed) for rows, seed in zip(chunks, seeds)]
+        self.pool.map(buildchunk, tasks)
+        #Double buffering: the old generation's buffer holds the next one
+        self.current = 1 - self.current
+        self.genes = self.store.genes[self.current]
+        self.nextgenes = self.store.genes[1 - self.current]
+        self.matches = self.store.matches[self.current]
+
+
+#Launch the program
+if __name__ == '__main__':
+    with SharedPopulation('to be or not to be ' * 1000, 0.01, 200) as sharedpopulation:
+        sharedpopulation.run()
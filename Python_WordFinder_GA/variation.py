@@ -0,0 +1,121 @@
+﻿"""Mutation operators of the genetic algorithm populations.
+
+An operator draws the genes of the initial individuals and the new value of every
+mutated gene from its alphabet. The mutation rate is a percentage: every gene has a
+mutationrate / 100 chance of mutating. Draws come from the population's
+rngstreams.RandomPool.
+
+Every operator also has batch kernels working on a whole uint8 gene matrix (rows are
+individuals) for the vector engines: the genes to mutate are picked with a boolean mask
+and all of them get their new value in one NumPy operation.
+
+Populations take a name in VARIATIONS or a Variation instance."""
+import numpy as np
+
+#' .' and ASCII 65 to 122: the characters of wordfinder_ga
+LETTERS = ' .' + ''.join([chr(char) for char in range(65, 123)])
+#ASCII 32 (space) to 126 (tilde)
+PRINTABLE = ''.join([chr(char) for char in range(32, 127)])
+
+
+class Variation(object):
+    """Base class for the mutation operators."""
+
+    def __init__(self, alphabet=LETTERS):
+        self.alphabet = alphabet
+
+    def newchars(self, count, randompool):
+        """Generates a string of random new characters"""
+        alphabet = self.alphabet
+        return ''.join([alphabet[i] for i in randompool.integers(0, len(alphabet), count)])
+
+    def newgene(self, char, randompool):
+        """Returns the new value of a mutated gene"""
+        raise NotImplementedError
+
+    def mutate(self, dna, mutationrate, randompool, target, genescores, fitness):
+        """Performs mutation on a given Dna with current mutation rate.
+        The gene scores are only updated in place at the mutated genes."""
+        #Same odds as randint(0, 99) < mutationrate
+        threshold = mutationrate / 100
+        newgene = self.newgene
+        newdna = list(dna)
+        for position, draw in enumerate(randompool.uniforms(len(dna))):
+            if draw < threshold:
+                character = newgene(newdna[position], randompool)
+                newdna[position] = character
+                genescores[position] = fitness.genescore(target[position], character, position)
+        return ''.join(newdna)
+
+    ##BATCH KERNELS##
+
+    def alphabetcodes(self):
+        """Returns the alphabet as a uint8 array of character codes"""
+        return np.frombuffer(self.alphabet.encode('latin-1'), dtype=np.uint8)
+
+    def batchnewchars(self, shape, rng):
+        """Generates an array of random new characters from a NumPy Generator"""
+        codes = self.alphabetcodes()
+        return codes[rng.integers(0, len(codes), shape, dtype=np.uint8)]
+
+    def batchnewgenes(self, genes, rng):
+        """Returns the new values of a 1-D array of mutated genes"""
+        raise NotImplementedError
+
+    def batchmutate(self, genes, mutationrate, rng, dtype=np.float64):
+        """Performs mutation in place on a gene matrix with current mutation rate.
+        dtype=np.float32 draws take half the memory."""
+        mutate = rng.random(genes.shape, dtype=dtype) < dtype(mutationrate / 100)
+        genes[mutate] = self.batchnewgenes(genes[mutate], rng)
+        return genes
+
+
+class NewChars(Variation):
+    """A mutated gene is a random character of the alphabet."""
+
+    def newgene(self, char, randompool):
+        return self.newchars(1, randompool)
+
+    def batchnewgenes(self, genes, rng):
+        return self.batchnewchars(len(genes), rng)
+
+
+class CharVariation(Variation):
+    """A mutated gene moves up or down the alphabet by 1 to mutationrange places.
+    The alphabet is a circular set: moving up from its last character gives its first."""
+
+    def __init__(self, mutationrange=3, alphabet=PRINTABLE):
+        Variation.__init__(self, alphabet)
+        self.mutationrange = mutationrange
+
+    def newgene(self, char, randompool):
+        mutationrange = self.mutationrange
+        if mutationrange <= 0:
+            return char
+        #For mutationrange = 3, variation here ranges from -3 to 2, then 0 becomes 3
+        variation = randompool.integers(-mutationrange, mutationrange, 1)[0]
+        if variation >= 0:
+            variation += 1
+        return self.alphabet[(self.alphabet.index(char) + variation) % len(self.alphabet)]
+
+    def batchnewgenes(self, genes, rng):
+        mutationrange = self.mutationrange
+        if mutationrange <= 0:
+            return genes
+        codes = self.alphabetcodes()
+        #Place of every character code in the alphabet: codes out of it count as its first
+        places = np.zeros(256, dtype=np.intp)
+        places[codes] = np.arange(len(codes))
+        variation = rng.integers(-mutationrange, mutationrange, len(genes))
+        variation[variation >= 0] += 1
+        return codes[(places[genes] + variation) % len(codes)]
+
+
+VARIATIONS = {'newchars': NewChars, 'charvariation': CharVariation}
+
+
+def getvariation(variation='newchars'):
+    """Returns a Variation instance from a name in VARIATIONS or a Variation instance"""
+    if isinstance(variation, str):
+        return VARIATIONS[variation]()
+    return variation
@@ -1,6 +1,18 @@
 ﻿"""Basic architecture for a simple Genetic Algorithm example."""
-import random
+import asyncio
+import json
+import os
 import time
+import numpy as np
+from adaptive import adaptivegrid, cellstats, sequentialsampling, successivehalving
+from convergence import ConvergenceMonitor, TimeBudget
+from fitness import getfitness
+from results import ResultsWriter, writestats
+from populationstats import PopulationStats
+from resultcache import keypart
+from rngstreams import RandomPool, cellseed, numpyrandom, pythonrandom, spawn
+from selection import CumulativeScoreIndex
+from variation import getvariation
 
 # 1 - Heredity
 # 2 - Variation
@@ -31,107 +43,144 @@ import time
 #   0 mutation relays on the implicit variation of the initial pop.
 
 class GeneticElement(object):
-    """Represents an individual with its own dna and associated score."""
-    dna = ''
-    score = 0
+    """Represents an individual with its own dna and associated score.
+    matches holds the per-gene scores of the population's fitness: with exact-match
+    1 for every gene equal to the target's, 0 otherwise."""
+    #No per-instance __dict__: populations hold many of these
+    __slots__ = ('dna', 'score', 'matches')
+
+    def __init__(self, dna='', score=0, matches=None):
+        self.dna = dna
+        self.score = score
+        self.matches = matches
+
+class Snapshot(object):
+    """State of one generation as yielded by Population.evolve.
+    populationlist is the generation itself, not a copy: it is freed with the snapshot."""
+    __slots__ = ('generation', 'bestdna', 'bestscore', 'totalscore', 'targetscore',
+                 'populationlist')
+
+    def __init__(self, generation, populationlist, targetscore, best=None, totalscore=None):
+        self.generation = generation
+        self.populationlist = populationlist
+        self.targetscore = targetscore
+        #The population usually knows its best individual and total already
+        if best is None:
+            best = max(populationlist, key=lambda element: element.score)
+        if totalscore is None:
+            totalscore = sum(element.score for element in populationlist)
+        self.bestdna = best.dna
+        self.bestscore = best.score
+        self.totalscore = totalscore
+
+    @property
+    def found(self):
+        """True when the best individual matches the target"""
+        return self.bestscore >= self.targetscore
 
 class Population(object):
     """Represents a population with parameters: target, mutation rate, population."""
+    #Name and version in the resultcache keys: bump the version when a change alters the
+    #results of seeded runs
+    cachename = 'wordfinder_ga.Population'
+    version = 1
     target = ''
     mutationrate = 0
     population = 0
     targetscore = 0
     totalScore = 0
     populationlist = list()
+    selection = None
+    rng = None
+    randompool = None
+    replacement = None
+    scoreindex = None
+    stats = None
+    childstats = None
+    evaluations = 0
+    fitness = None
+    variation = None
+    #Methods a profiling.Profiler can hook, by section
+    profilehooks = {
+        'selection': ('pickparents', ),
+        'crossover': ('crossover', ),
+        'mutation': ('variation.mutate', ),
+        'fitness': ('fitness.score', 'fitness.genescore'),
+        'draws': ('randompool.uniforms', 'rng.randint', 'rng.random', 'rng.uniform', 'rng.sample'),
+        'generation': ('step', ),
+        }
 
     #Constructor
-    def __init__(self, target, mutationrate, population):
+    def __init__(self, target, mutationrate, population, selection=CumulativeScoreIndex,
+                 seed=None, replacement=None, fitness='exact', variation='newchars'):
         self.target = target
         self.mutationrate = mutationrate
         self.population = population
-        self.targetscore = 2**len(target)
-        self.populationlist = Population.initpopulation(target, len(target), population)
+        #Any selection.Selection class: built from the scores once per generation
+        self.selection = selection
+        #Optional replacement.Replacement: None replaces the whole population every generation
+        self.replacement = replacement
+        self.scoreindex = None
+        #Individuals scored so far
+        self.evaluations = population
+        #Own random streams instead of the shared global state
+        selectionseed, kernelseed = spawn(seed, 2)
+        self.rng = pythonrandom(selectionseed)
+        #Crossover and mutation take their draws in blocks from a pool
+        self.randompool = RandomPool(numpyrandom(kernelseed))
+        #Name in fitness.FITNESSES, Fitness class or instance or gene score function
+        self.fitness = getfitness(fitness)
+        #Mutation operator: name in variation.VARIATIONS or Variation instance
+        self.variation = getvariation(variation)
+        self.targetscore = self.fitness.targetscore(target)
+        self.populationlist = Population.initpopulation(
+            target, len(target), population, self.randompool, self.fitness, self.variation)
+        #Best, total and scores of the current generation, None when the list was changed by hand
+        self.stats = PopulationStats.of(self.populationlist)
 
     ##GENETIC RULES##
 
     #Initialization
     @staticmethod
-    def initpopulation(target, length, population):
+    def initpopulation(target, length, population, randompool, fitness, variation):
         """Initializes population with a random set of individuals"""
         currentpopulation = 0
         newpopulationlist = list()
         while currentpopulation < population:
-            newdna = ''
-            count = 0
-            while count < length:
-                newdna = newdna + Population.newchar()
-                count += 1
+            newdna = variation.newchars(length, randompool)
             newchild = GeneticElement()
             newchild.dna = newdna
-            newchild.score = Population.fitnessfunction(target, length, newdna)
+            newchild.matches = fitness.genescores(target, newdna)
+            newchild.score = fitness.score(newchild.matches)
             newpopulationlist.append(newchild)
             currentpopulation += 1
         return newpopulationlist
 
-    #Selection
-    @staticmethod
-    def fitnessfunction(target, length, dna):
-        """Evaluates a given individual's score"""
-        score = 0
-        position = 0
-        while position < length:
-            if target[position] == dna[position]:
-                score += 1
-            position += 1
-        return 2**score
-
     #Heredity
     @staticmethod
-    def crossover(length, parent_a, parent_b):
-        """Performs parental gene crosover"""
-        newdna = ''
+    def crossover(length, parent_a, parent_b, randompool):
+        """Performs parental gene crosover.
+        Returns the new dna and its gene scores, copied from the parents' gene scores."""
         score_a = parent_a.score
-        score_b = parent_b.score
-        totalscore = score_a + score_b
-        count = 0
-        while count < length:
-            #The fittest is more likely to pass its genes
-            if random.randint(0, totalscore) < score_a:
-                newdna = newdna + parent_a.dna[count]
-            else:
-                newdna = newdna + parent_b.dna[count]
-            count += 1
-        return newdna
-
-    #Variation
-    @staticmethod
-    def newchar():
-        """Generates a random new character"""
-        char = random.randint(63, 122)
-        if char == 63:
-            char = 32
-        if char == 64:
-            char = 46
-        return chr(char)
+        totalscore = score_a + parent_b.score
+        #The fittest is more likely to pass its genes: same odds as randint(0, totalscore) < score_a
+        ratio = score_a / (totalscore + 1)
+        inherit = [draw < ratio for draw in randompool.uniforms(length)]
+        dna = ''.join([gene_a if froma else gene_b
+                       for gene_a, gene_b, froma in zip(parent_a.dna, parent_b.dna, inherit)])
+        matches = type(parent_a.matches)([match_a if froma else match_b
+                             for match_a, match_b, froma in zip(parent_a.matches, parent_b.matches, inherit)])
+        return dna, matches
 
-    @staticmethod
-    def mutation(dna, mutationrate):
-        """Performs mutation on a given Dna with current mutation rate"""
-        newdna = ''
-        for character in dna:
-            if random.randint(0, 99) < mutationrate:
-                newdna = newdna + Population.newchar()
-            else:
-                newdna = newdna + character
-        return newdna
-
-    @staticmethod
-    def crossmutation(target, length, parent_a, parent_b, mutationrate):
+    def crossmutation(self, target, length, parent_a, parent_b, mutationrate, randompool):
         """Crossover + Mutation. Returns a brand new individual"""
         newchild = GeneticElement()
-        dna = Population.crossover(length, parent_a, parent_b)
-        newchild.dna = Population.mutation(dna, mutationrate)
-        newchild.score = Population.fitnessfunction(target, length, newchild.dna)
+        dna, matches = self.crossover(length, parent_a, parent_b, randompool)
+        #Variation
+        newchild.dna = self.variation.mutate(dna, mutationrate, randompool, target, matches, self.fitness)
+        #The score comes from the gene scores: the dna is not compared with the target again
+        newchild.matches = matches
+        newchild.score = self.fitness.score(matches)
         return newchild
 
     ##GENETIC ENGINE##
@@ -139,135 +188,389 @@ class Population(object):
     #These methods manage the population list
     def gettotalscore(self):
         """Sums the score of all the population to do the probability calculations"""
+        if self.stats is not None:
+            return self.stats.totalscore
         newscore = 0
         for element in self.populationlist:
             newscore += element.score
         return newscore
-    def pickrandomparent(self, lastscore):
-        """Returns a random parent Id with probability pi / (p1 + p2 + ... + pn)
-        with p being its score. It is executed when there's 2 or more eligible parents."""
-        comparablescore = random.randint(0, lastscore)
-        currentscore = 0
-        count = 0
-        while currentscore < comparablescore:
-            currentscore += self.populationlist[count].score
-            if currentscore < comparablescore:
-                count += 1
-        return count
+    def pickparents(self, populationlist, count, scores=None):
+        """Returns count (id_a, id_b) parent pairs. scores are the scores of
+        populationlist when the caller already has them."""
+        if scores is None:
+            if self.stats is not None and populationlist is self.populationlist:
+                scores = self.stats.scores
+            else:
+                scores = [element.score for element in populationlist]
+        #The selection is built once so parent draws don't rescan the population
+        selection = self.selection(scores, self.rng)
+        #All parents are forced to be different
+        return selection.pickpairs(count)
     def newgeneration(self, target, length, mutationrate, population, populationlist):
         """Creates one generation."""
         lastscore = self.gettotalscore()
+        maxscoreid = -1
+        if self.stats is not None and populationlist is self.populationlist:
+            maxscoreid = self.stats.bestid
+        elif lastscore > 0:
+            currentmaxscore = 0
+            for i, element in enumerate(populationlist):
+                if element.score > currentmaxscore:
+                    currentmaxscore = element.score
+                    maxscoreid = i
+        return self.makechildren(
+            target, length, mutationrate, population, populationlist, lastscore, maxscoreid)
+    def makechildren(self, target, length, mutationrate, count, populationlist, lastscore, maxscoreid,
+                     scores=None):
+        """Creates count children of a population list with a given total score
+        and the id of its best individual, and optionally its scores.
+        Their statistics are left in childstats."""
+        self.evaluations += count
         newgenerationlist = list()
+        #Every child is added to the statistics as it is created
+        stats = PopulationStats()
+        self.childstats = stats
+        size = len(populationlist)
+        #Crossover and mutation draws of the whole generation come in one block
+        self.randompool.reserve(2 * count * length)
         #lastscore = 0 implies there's no preferred parent
         if lastscore == 0:
-            count = 0
-            while count < population:
+            while len(newgenerationlist) < count:
                 #Randomly picks 2 parents
-                parentcouple = random.sample(populationlist, 2)
+                parentcouple = self.rng.sample(populationlist, 2)
                 parent_a = parentcouple[0]
                 parent_b = parentcouple[1]
                 #Creates new child
-                newchild = Population.crossmutation(
-                    target, length, parent_a, parent_b, mutationrate
+                newchild = self.crossmutation(
+                    target, length, parent_a, parent_b, mutationrate, self.randompool
                     )
                 newgenerationlist.append(newchild)
-                count += 1
+                stats.add(newchild)
+        #lastscore = max score implies there's just 1 preferred parent since lastscore > 0
+        elif lastscore == populationlist[maxscoreid].score:
+            while len(newgenerationlist) < count:
+                parent_id_b = self.rng.randint(1, size) - 1
+                #Forces both parents to be different
+                while parent_id_b == maxscoreid:
+                    parent_id_b = self.rng.randint(1, size) - 1
+                parent_a = populationlist[maxscoreid]
+                parent_b = populationlist[parent_id_b]
+                #Creates child
+                newchild = self.crossmutation(
+                    target, length, parent_a, parent_b, mutationrate, self.randompool
+                    )
+                newgenerationlist.append(newchild)
+                stats.add(newchild)
+        #lastscore != max score is the regular case where there's 2 or more eligible parents
         else:
-            currentmaxscore = 0
-            maxscoreid = -1
-            for i, element in enumerate(populationlist):
-                if element.score > currentmaxscore:
-                    currentmaxscore = element.score
-                    maxscoreid = i
-            #lastscore = currentmaxscore implies there's just 1 preferred parent since lastscore > 0
-            if lastscore == currentmaxscore:
-                count = 0
-                while count < population:
-                    parent_id_b = random.randint(1, population) - 1
-                    #Forces both parents to be different
-                    while parent_id_b == maxscoreid:
-                        parent_id_b = random.randint(1, population) - 1
-                    parent_a = populationlist[maxscoreid]
-                    parent_b = populationlist[parent_id_b]
-                    #Creates child
-                    newchild = Population.crossmutation(
-                        target, length, parent_a, parent_b, mutationrate
-                        )
-                    newgenerationlist.append(newchild)
-                    count += 1
-            #lastscore != myMaxScore is the regular case where there's 2 or more eligible parents
-            else:
-                count = 0
-                while count < self.population:
-                    parent_id_a = self.pickrandomparent(lastscore)
-                    parent_id_b = self.pickrandomparent(lastscore)
-                    #Forces all parents to be different
-                    while parent_id_a == parent_id_b:
-                        parent_id_b = self.pickrandomparent(lastscore)
-                    #Creates parents
-                    parent_a = populationlist[parent_id_a]
-                    parent_b = populationlist[parent_id_b]
-                    #Creates child
-                    newchild = Population.crossmutation(
-                        target, length, parent_a, parent_b, mutationrate
-                        )
-                    newgenerationlist.append(newchild)
-                    count += 1
+            for parent_id_a, parent_id_b in self.pickparents(populationlist, count, scores):
+                #Creates parents
+                parent_a = populationlist[parent_id_a]
+                parent_b = populationlist[parent_id_b]
+                #Creates child
+                newchild = self.crossmutation(
+                    target, length, parent_a, parent_b, mutationrate, self.randompool
+                    )
+                newgenerationlist.append(newchild)
+                stats.add(newchild)
         return newgenerationlist
+    def step(self):
+        """Replaces the population with the next one"""
+        if self.replacement is None:
+            self.populationlist = self.newgeneration(
+                self.target, len(self.target), self.mutationrate, self.population, self.populationlist
+                )
+            self.stats = self.childstats
+        else:
+            #The replacement's score index takes over the statistics
+            self.stats = None
+            self.populationlist = self.replacement.replace(self)
+
+    def evolve(self, stopcount=None):
+        """Yields a Snapshot of every generation until the target is found or
+        stopcount generations are done. The next generation is only built when the
+        consumer asks for it, so breaking out of the loop cancels the run."""
+        count = 0
+        while stopcount is None or count < stopcount:
+            count += 1
+            if self.scoreindex is not None:
+                snapshot = Snapshot(count, self.populationlist, self.targetscore,
+                                    self.scoreindex.best(), self.scoreindex.totalscore)
+            elif self.stats is not None:
+                snapshot = Snapshot(count, self.populationlist, self.targetscore,
+                                    self.stats.best, self.stats.totalscore)
+            else:
+                snapshot = Snapshot(count, self.populationlist, self.targetscore)
+            yield snapshot
+            if snapshot.found:
+                return
+            self.step()
+
+    async def aevolve(self, stopcount=None):
+        """Same as evolve for asyncio code: yields control to the event loop between generations"""
+        for snapshot in self.evolve(stopcount):
+            yield snapshot
+            await asyncio.sleep(0)
+
+    ##THE MAIN SCRIPT##
+    def run(self):
+        """Runs the simulation"""
+        print('')
+        print('\t{}\t{}\t\t {}'.format('Generation', 'Best', 'Score'))
+        print('\t---------------------------------------------------')
+        for snapshot in self.evolve():
+            print('\t{}\t\t{}\t\t {}/{}'.format(
+                snapshot.generation, snapshot.bestdna, snapshot.bestscore, self.targetscore))
+        print('')
+        print('\tFound \'' + self.target + '\' after ' + str(snapshot.generation) + ' generations.')
+        print(
+            '\tMutation Rate: ' + str(self.mutationrate) + '% chance.\n' +
+            '\tPopulation: ' + str(self.population) + ' individuals.'
+            )
+    def runcount(self, stopcount, monitor=None):
+        """Runs the simulation up to a given number of generations, None for no limit.
+        An optional ConvergenceMonitor can stop it earlier and records why it stopped."""
+        count = 0
+        found = False
+        for snapshot in self.evolve(stopcount):
+            count = snapshot.generation
+            found = snapshot.found
+            if not found and monitor is not None and monitor.update(
+                    [element.score for element in snapshot.populationlist],
+                    [element.dna for element in snapshot.populationlist]):
+                break
+        if monitor is not None:
+            monitor.finish(found)
+        return count
+
+class VectorPopulation(object):
+    """Represents a population stored as a 2-D uint8 matrix (rows are individuals,
+    columns are genes). Same surface as Population but works a whole generation at once.
+    matches holds the fitness value of every individual: its number of matching genes
+    with exact-match (see fitness.py)."""
+    #Name and version in the resultcache keys: bump the version when a change alters the
+    #results of seeded runs
+    cachename = 'wordfinder_ga.VectorPopulation'
+    version = 1
+    target = ''
+    mutationrate = 0
+    population = 0
+    targetscore = 0
+    targetvalue = 0
+    fitness = None
+    variation = None
+
+    #Constructor
+    def __init__(self, target, mutationrate, population, seed=None, fitness='exact',
+                 variation='newchars'):
+        self.target = target
+        self.mutationrate = mutationrate
+        self.population = population
+        #Own NumPy Generator instead of the shared np.random state
+        self.rng = numpyrandom(seed)
+        #Whole generations are scored by the fitness batch kernel
+        self.fitness = getfitness(fitness)
+        #Mutation operator: whole generations are mutated by its batch kernel
+        self.variation = getvariation(variation)
+        self.targetscore = self.fitness.targetscore(target)
+        self.targetgenes = np.frombuffer(target.encode('latin-1'), dtype=np.uint8)
+        self.targetvalue = self.fitness.targetvalue(self.targetgenes)
+        self.genes = VectorPopulation.initpopulation(len(target), population, self.rng, self.variation)
+        self.matches = self.fitness.batchvalues(self.targetgenes, self.genes)
+
+    ##GENETIC RULES##
+
+    #Initialization
+    @staticmethod
+    def initpopulation(length, population, rng, variation):
+        """Initializes the gene matrix with random characters of the variation's alphabet"""
+        return variation.batchnewchars((population, length), rng)
+
+    #Heredity
+    @staticmethod
+    def crossover(genes_a, genes_b, ratio, rng):
+        """Performs parental gene crossover for every child. ratio holds, per child,
+        the chance of taking a gene from parent a"""
+        inherit = rng.random(genes_a.shape) < ratio[:, np.newaxis]
+        return np.where(inherit, genes_a, genes_b)
+
+    ##GENETIC ENGINE##
+
+    def pickparents(self, scores):
+        """Returns two arrays of parent ids with probability pi / (p1 + p2 + ... + pn).
+        Both parents of a child are forced to be different."""
+        totalscore = scores.sum()
+        #No score at all: every parent is as likely
+        probabilities = scores / totalscore if totalscore > 0 else None
+        parents_a = self.rng.choice(self.population, self.population, p=probabilities)
+        parents_b = self.rng.choice(self.population, self.population, p=probabilities)
+        if self.population > 1:
+            same = parents_a == parents_b
+            retries = 0
+            while same.any() and retries < 10:
+                parents_b[same] = self.rng.choice(
+                    self.population, np.count_nonzero(same), p=probabilities
+                    )
+                same = parents_a == parents_b
+                retries += 1
+            #An alpha parent holding (almost) all the score mates a random different parent
+            shift = self.rng.integers(1, self.population, np.count_nonzero(same))
+            parents_b[same] = (parents_a[same] + shift) % self.population
+        return parents_a, parents_b
+
+    def newgeneration(self):
+        """Replaces the gene matrix with a new generation."""
+        scores = self.fitness.selectionweights(self.matches)
+        parents_a, parents_b = self.pickparents(scores)
+        ratio = self.fitness.parentratio(self.matches[parents_a], self.matches[parents_b])
+        genes = VectorPopulation.crossover(
+            self.genes[parents_a], self.genes[parents_b], ratio, self.rng)
+        self.genes = self.variation.batchmutate(genes, self.mutationrate, self.rng)
+        self.matches = self.fitness.batchvalues(self.targetgenes, self.genes)
 
     ##THE MAIN SCRIPT##
     def run(self):
         """Runs the simulation"""
-        currentbestscore = 0
         count = 0
         print('')
         print('\t{}\t{}\t\t {}'.format('Generation', 'Best', 'Score'))
         print('\t---------------------------------------------------')
-        length = len(self.target)
-        maxscore = self.targetscore
-        while currentbestscore < self.targetscore:
+        while True:
             count += 1
-            bestdna = ''
-            generationbestscore = 0
-            for element in self.populationlist:
-                if element.score > generationbestscore:
-                    generationbestscore = element.score
-                    bestdna = element.dna
-                    if generationbestscore > currentbestscore:
-                        currentbestscore = generationbestscore
-            print('\t{}\t\t{}\t\t {}/{}'.format(count, bestdna, generationbestscore, maxscore))
-            if currentbestscore < self.targetscore:
-                self.populationlist = self.newgeneration(
-                    self.target, length, self.mutationrate, self.population, self.populationlist
-                    )
+            bestid = int(self.matches.argmax())
+            bestdna = self.genes[bestid].tobytes().decode('latin-1')
+            print('\t{}\t\t{}\t\t {}/{}'.format(
+                count, bestdna, self.fitness.valuescore(self.matches[bestid]), self.targetscore))
+            if self.matches[bestid] >= self.targetvalue:
+                break
+            self.newgeneration()
         print('')
         print('\tFound \'' + self.target + '\' after ' + str(count) + ' generations.')
         print(
             '\tMutation Rate: ' + str(self.mutationrate) + '% chance.\n' +
             '\tPopulation: ' + str(self.population) + ' individuals.'
             )
-    def runcount(self, stopcount):
-        """Runs the simulation up to a given number of generations"""
-        currentmaxscore = 0
+    def runcount(self, stopcount, monitor=None):
+        """Runs the simulation up to a given number of generations.
+        An optional ConvergenceMonitor can stop it earlier and records why it stopped."""
         count = 0
-        length = len(self.target)
-        #maxscore = self.targetscore
-        while count < stopcount and currentmaxscore < self.targetscore:
+        reachedtarget = False
+        while stopcount is None or count < stopcount:
             count += 1
-            #bestdna = ''
-            generationbestscore = 0
-            for element in self.populationlist:
-                if element.score > generationbestscore:
-                    generationbestscore = element.score
-                    #bestdna = element.dna
-                    if generationbestscore > currentmaxscore:
-                        currentmaxscore = generationbestscore
-            if currentmaxscore < self.targetscore:
-                self.populationlist = self.newgeneration(
-                    self.target, length, self.mutationrate, self.population, self.populationlist
-                    )
+            if self.matches.max() >= self.targetvalue:
+                reachedtarget = True
+                break
+            #Matches rank individuals like 2**matches without overflowing on long targets
+            if monitor is not None and monitor.update(
+                    self.matches.tolist(), [row.tobytes() for row in self.genes]):
+                break
+            self.newgeneration()
+        if monitor is not None:
+            monitor.finish(reachedtarget)
         return count
 
+class LongPopulation(VectorPopulation):
+    """VectorPopulation for long targets (10k to 1M characters).
+    Scores stay as fitness values (match counts with exact-match, the log2 of the
+    2**matches score) so selection works on fixed-width floats, and children are built in chunks of rows written straight into
+    a second gene matrix, so memory stays at two gene matrices plus one chunk."""
+    cachename = 'wordfinder_ga.LongPopulation'
+    #Upper bound of genes processed at once by the crossover and mutation kernels
+    chunkgenes = 1 << 22
+
+    #Constructor
+    def __init__(self, target, mutationrate, population, seed=None, fitness='exact',
+                 variation='newchars'):
+        self.target = target
+        self.mutationrate = mutationrate
+        self.population = population
+        self.rng = numpyrandom(seed)
+        self.fitness = getfitness(fitness)
+        self.variation = getvariation(variation)
+        self.targetgenes = np.frombuffer(target.encode('latin-1'), dtype=np.uint8)
+        #2**len(target) would be a huge integer: scores are compared as fitness values
+        self.targetvalue = self.fitness.targetvalue(self.targetgenes)
+        self.targetscore = self.targetvalue
+        self.genes = np.empty((population, len(target)), dtype=np.uint8)
+        self.nextgenes = np.empty_like(self.genes)
+        self.matches = np.empty(population, dtype=np.int64)
+        for rows in self.chunks():
+            self.genes[rows] = self.variation.batchnewchars(
+                (rows.stop - rows.start, len(target)), self.rng)
+            self.matches[rows] = self.fitness.batchvalues(self.targetgenes, self.genes[rows])
+
+    def chunks(self):
+        """Yields slices of rows holding at most chunkgenes genes"""
+        rows = max(1, self.chunkgenes // max(1, len(self.target)))
+        for start in range(0, self.population, rows):
+            yield slice(start, min(start + rows, self.population))
+
+    ##GENETIC RULES##
+
+    #Heredity and Variation
+    @staticmethod
+    def buildchildren(genes, children, parents_a, parents_b, ratio, mutationrate, targetgenes, rng,
+                      fitness, variation):
+        """Crossover + Mutation of a chunk of children written in place into children.
+        Returns their fitness values."""
+        genes_a = genes[parents_a]
+        genes_b = genes[parents_b]
+        #float32 draws: half the memory of the default float64 ones
+        inherit = rng.random(genes_a.shape, dtype=np.float32) < ratio[:, np.newaxis]
+        np.copyto(children, genes_b)
+        np.copyto(children, genes_a, where=inherit)
+        variation.batchmutate(children, mutationrate, rng, np.float32)
+        return fitness.batchvalues(targetgenes, children)
+
+    ##GENETIC ENGINE##
+
+    def newgeneration(self):
+        """Replaces the gene matrix with a new generation, one chunk of children at a time."""
+        scores = self.fitness.selectionweights(self.matches)
+        parents_a, parents_b = self.pickparents(scores)
+        ratio = self.fitness.parentratio(self.matches[parents_a], self.matches[parents_b])
+        matches = np.empty_like(self.matches)
+        for rows in self.chunks():
+            matches[rows] = LongPopulation.buildchildren(
+                self.genes, self.nextgenes[rows], parents_a[rows], parents_b[rows], ratio[rows],
+                self.mutationrate, self.targetgenes, self.rng, self.fitness, self.variation)
+        #Double buffering: the old generation's matrix holds the next one
+        self.genes, self.nextgenes = self.nextgenes, self.genes
+        self.matches = matches
+
+    ##THE MAIN SCRIPT##
+    def run(self):
+        """Runs the simulation printing only the start of the best individual"""
+        count = 0
+        print('')
+        print('\t{}\t{}\t\t {}'.format('Generation', 'Best', 'Value'))
+        print('\t---------------------------------------------------')
+        length = len(self.target)
+        while True:
+            count += 1
+            bestid = int(self.matches.argmax())
+            bestdna = self.genes[bestid, :20].tobytes().decode('latin-1')
+            print('\t{}\t\t{}...\t\t {}/{}'.format(count, bestdna, self.matches[bestid], self.targetvalue))
+            if self.matches[bestid] >= self.targetvalue:
+                break
+            self.newgeneration()
+        print('')
+        print('\tFound the {} characters target after {} generations.'.format(length, count))
+        print(
+            '\tMutation Rate: ' + str(self.mutationrate) + '% chance.\n' +
+            '\tPopulation: ' + str(self.population) + ' individuals.'
+            )
+
+def simulate(workitem):
+    """Runs one (engine, engine options, target, mutation rate, population, max generation,
+    stop policies, seed) work item. Returns its generations, the reason it stopped and the
+    seconds it took. It lives at module level so process pools can send it to their workers."""
+    engine, options, target, mutationrate, population, maxgen, stoppolicies, seed = workitem
+    start_time = time.perf_counter()
+    monitor = ConvergenceMonitor(stoppolicies)
+    generations = engine(target, mutationrate, population, seed=seed, **options).runcount(maxgen, monitor)
+    return generations, monitor.reason, time.perf_counter() - start_time
+
 class PopulationMap(object):
     """Runs all simulations within given ranges of population and mutation rates"""
     target = ''
@@ -276,69 +579,305 @@ class PopulationMap(object):
     maxpopulation = 0
     minmutationrate = 0
     maxmutationrate = 0
+    engine = None
+    seed = None
+    stoppolicies = ()
+    stopreasons = dict()
+    cache = None
+    runs = None
+    fitness = None
+    variation = None
+    executor = None
+    workers = None
+    populationstep = 5
+    mutationratestep = 1
 
     #Constructor
     def __init__(self, target, maxgen,
-                 minpopulation, maxpopulation, minmutationrate, maxmutationrate):
+                 minpopulation, maxpopulation, minmutationrate, maxmutationrate,
+                 engine=Population, seed=None, stoppolicies=(), cache=None, runs=None,
+                 fitness=None, variation=None, executor=None, populationstep=5, mutationratestep=1,
+                 workers=None):
         self.target = target
         self.maxgen = maxgen
         self.minpopulation = minpopulation
         self.maxpopulation = maxpopulation
         self.minmutationrate = minmutationrate
         self.maxmutationrate = maxmutationrate
+        #Population, VectorPopulation or LongPopulation: all share the runcount surface
+        self.engine = engine
+        #Root seed of the sweep: None leaves every run unseeded
+        self.seed = seed
+        #convergence.StopPolicy objects shared by every run: stagnating runs stop early
+        self.stoppolicies = list(stoppolicies)
+        #How many runs stopped for each reason
+        self.stopreasons = dict()
+        #Optional resultcache.ResultCache: seeded runs already in it are not run again
+        self.cache = cache
+        #Optional results.RunsWriter: every run is stored with its seed key and timing
+        self.runs = runs
+        #Fitness and mutation operator of Population (see fitness.py and variation.py):
+        #None for the engine's default
+        self.fitness = fitness
+        self.variation = variation
+        #Anything with a map(function, items, chunksize=n) giving back results in order, like a
+        #concurrent.futures.ProcessPoolExecutor: None runs everything in this process
+        self.executor = executor
+        #Workers of the executor, for the chunk sizes: None for the number of cores
+        self.workers = workers
+        #Mutation rates are percentages, like the engines'
+        self.populationstep = populationstep
+        self.mutationratestep = mutationratestep
 
     #TODO: Matrix operations and exception handling
 
+    def options(self):
+        """Returns the keyword arguments the engine is built with"""
+        options = dict()
+        if self.fitness is not None:
+            options['fitness'] = self.fitness
+        if self.variation is not None:
+            options['variation'] = self.variation
+        return options
+
+    def runmany(self, target, maxgen, populations, mutationrates, batch):
+        """Yields the generations of a list of ((population id, mutation rate id), iteration)
+        runs in order. Runs in the cache are not run again, the others go to the executor.
+        The seed of a run comes from its (population id, mutation rate id, iteration) seed key."""
+        options = self.options()
+        #Runs stopped by a wall-clock budget can't be replayed: they are never cached
+        cacheable = self.cache is not None and not any(
+            isinstance(policy, TimeBudget) for policy in self.stoppolicies)
+        runs = list()
+        for (populationid, mutationrateid), iteration in batch:
+            population = populations[populationid]
+            mutationrate = mutationrates[mutationrateid]
+            seedkey = (populationid, mutationrateid, iteration)
+            #Every run has its own seed derived from its place in the grid
+            seed = cellseed(self.seed, *seedkey)
+            key = None
+            cached = None
+            if cacheable:
+                key = self.cache.key(self.engine, seed, target, mutationrate, population, maxgen,
+                                     self.stoppolicies, *options.values())
+                cached = self.cache.get(key)
+            workitem = (self.engine, options, target, mutationrate, population, maxgen,
+                        self.stoppolicies, seed)
+            runs.append((workitem, seedkey if seed is not None else None, key, cached))
+
+        missing = [workitem for workitem, seedkey, key, cached in runs if cached is None]
+        if self.executor is None:
+            computed = map(simulate, missing)
+        else:
+            #Chunks of runs per task: a few tasks per worker instead of a round trip per run
+            chunksize = max(1, len(missing) // (4 * (self.workers or os.cpu_count() or 1)))
+            computed = iter(self.executor.map(simulate, missing, chunksize=chunksize))
+        for workitem, seedkey, key, cached in runs:
+            if cached is not None:
+                generations, reason = cached
+                seconds = float('nan')
+            else:
+                generations, reason, seconds = next(computed)
+                if cacheable:
+                    self.cache.put(key, generations, reason)
+            self.stopreasons[reason] = self.stopreasons.get(reason, 0) + 1
+            if self.runs is not None:
+                #(population, mutation rate) of the work item
+                self.runs.append((workitem[4], workitem[3]), seedkey, generations, seconds, reason)
+            yield generations
+
+    @staticmethod
+    def gridranges(minpopulation, maxpopulation, minmutationrate, maxmutationrate,
+                   populationstep=5, mutationratestep=1):
+        """Returns the populations and mutation rates of the grid"""
+        populations = list(range(minpopulation, maxpopulation + 1, populationstep))
+        #Counted steps: adding up fractional steps would drift past the last rate
+        steps = int(round((maxmutationrate - minmutationrate) / mutationratestep))
+        mutationrates = [minmutationrate + step * mutationratestep for step in range(steps + 1)]
+        return populations, mutationrates
+
+    def gridheader(self, target, maxgen, mutationrates, iterations):
+        """Returns the header of data.csv: the signature of the sweep, so resume only
+        continues a file with the same target, max generation, mutation rates, iterations,
+        root seed, engine, engine options and stop policies"""
+        return ('target={!r};maxgen={};mutationrates={};iterations={};seed={};engine={};'
+                'options={};stoppolicies={};').format(
+            target, maxgen, ','.join([str(mutationrate) for mutationrate in mutationrates]),
+            iterations, json.dumps(keypart(self.seed)), json.dumps(keypart(self.engine)),
+            json.dumps({name: keypart(option) for name, option in self.options().items()}),
+            json.dumps(keypart(self.stoppolicies)))
+
     #Matrix simulator
     def fillmap(self,
                 target, maxgen, minpopulation, maxpopulation,
-                minmutationrate, maxmutationrate, iterations):
+                minmutationrate, maxmutationrate, iterations, resume=False):
         """Fills the matrix with the values of the simulation map"""
+        #Stop reasons of this sweep only
+        self.stopreasons = dict()
+        populations, mutationrates = PopulationMap.gridranges(
+            minpopulation, maxpopulation, minmutationrate, maxmutationrate,
+            self.populationstep, self.mutationratestep)
 
-        fileobj = open('data.csv', 'w')
+        #Every cell is flushed to data.csv as soon as it is finished
+        writer = ResultsWriter(populations, mutationrates,
+                               self.gridheader(target, maxgen, mutationrates, iterations),
+                               resume=resume)
+        try:
+            #Resumed sweeps skip the cells already in the file
+            cells = [(populationid, mutationrateid)
+                     for populationid, currentpopulation in enumerate(populations)
+                     for mutationrateid, mutationrate in enumerate(mutationrates)
+                     if not writer.done((currentpopulation, mutationrate))]
+            #The whole grid is one batch so the executor can run any of its runs
+            batch = [(cell, iteration) for cell in cells for iteration in range(iterations)]
+            sumgen = 0
+            for ((populationid, mutationrateid), iteration), generations in zip(
+                    batch, self.runmany(target, maxgen, populations, mutationrates, batch)):
+                sumgen += generations
+                #Runs come back in order: the last iteration finishes the cell
+                if iteration == iterations - 1:
+                    genaverage = sumgen / iterations
+                    writer.write((populations[populationid], mutationrates[mutationrateid]), genaverage)
+                    sumgen = 0
+        finally:
+            writer.close()
+            if self.cache is not None:
+                self.cache.commit()
+            if self.runs is not None:
+                self.runs.flush()
 
-        currentpopulation = minpopulation
-        while currentpopulation <= maxpopulation:
-            fileobj.write('{};'.format(currentpopulation))
+    def runbatch(self, target, maxgen, populations, mutationrates, batch):
+        """Runs a list of ((population id, mutation rate id), iteration) runs.
+        Returns their generations in order."""
+        #Same seeds as fillmap: the cells that are run get the same values
+        return list(self.runmany(target, maxgen, populations, mutationrates, batch))
 
-            mutationrate = minmutationrate
-            while mutationrate <= maxmutationrate:
+    #Sequential matrix simulator
+    def sequentialmap(self,
+                      target, maxgen, minpopulation, maxpopulation,
+                      minmutationrate, maxmutationrate, ciwidth,
+                      miniterations=3, maxiterations=50, confidence=0.95):
+        """Fills the matrix running every cell until the confidence interval of its mean
+        generations is ciwidth wide, or maxiterations times (see adaptive.py).
+        The (mean, std, n) of every cell go to data_stats.csv and are returned."""
+        #Stop reasons of this sweep only
+        self.stopreasons = dict()
+        populations, mutationrates = PopulationMap.gridranges(
+            minpopulation, maxpopulation, minmutationrate, maxmutationrate,
+            self.populationstep, self.mutationratestep)
+        cells = [(populationid, mutationrateid)
+                 for populationid in range(len(populations))
+                 for mutationrateid in range(len(mutationrates))]
+        runs = sequentialsampling(
+            cells, lambda batch: self.runbatch(target, maxgen, populations, mutationrates, batch),
+            ciwidth, miniterations, maxiterations, confidence)
 
-                currentiteration = 0
-                sumgen = 0
-                while currentiteration < iterations:
-                    mypopulation = Population(target, mutationrate, currentpopulation)
-                    sumgen += mypopulation.runcount(maxgen)
-                    currentiteration += 1
+        stats = dict()
+        writer = ResultsWriter(populations, mutationrates,
+                               self.gridheader(target, maxgen, mutationrates, maxiterations))
+        try:
+            for populationid, mutationrateid in cells:
+                mean, std = cellstats(runs[(populationid, mutationrateid)])
+                cell = (populations[populationid], mutationrates[mutationrateid])
+                stats[cell] = (mean, std, len(runs[(populationid, mutationrateid)]))
+                writer.write(cell, mean)
+        finally:
+            writer.close()
+            if self.cache is not None:
+                self.cache.commit()
+            if self.runs is not None:
+                self.runs.flush()
+        writestats(stats)
+        return stats
 
-                genaverage = sumgen / iterations
-                fileobj.write('{};'.format(genaverage))
-                mutationrate += 1
+    #Adaptive matrix simulator
+    def adaptivemap(self,
+                    target, maxgen, minpopulation, maxpopulation,
+                    minmutationrate, maxmutationrate, iterations,
+                    coarsestep=4, threshold=None, interpolate=True):
+        """Fills the same matrix as fillmap running only part of the cells (see adaptive.py).
+        Cells left out are interpolated, or left empty with interpolate=False.
+        Returns the (mean, std, runs) of every cell that was run."""
+        #Stop reasons of this sweep only
+        self.stopreasons = dict()
+        populations, mutationrates = PopulationMap.gridranges(
+            minpopulation, maxpopulation, minmutationrate, maxmutationrate,
+            self.populationstep, self.mutationratestep)
+        if threshold is None:
+            #A tenth of the generations range
+            threshold = (maxgen or 100) / 10
 
-            fileobj.write('\n')
-            currentpopulation += 5
+        def runbatch(batch):
+            return self.runbatch(target, maxgen, populations, mutationrates, batch)
 
-        fileobj.close()
+        values, stats = adaptivegrid(
+            len(populations), len(mutationrates),
+            lambda cells: successivehalving(cells, iterations, maxgen or float('inf'), runbatch),
+            coarsestep, threshold)
+
+        writer = ResultsWriter(populations, mutationrates,
+                               self.gridheader(target, maxgen, mutationrates, iterations))
+        try:
+            for populationid, currentpopulation in enumerate(populations):
+                for mutationrateid, mutationrate in enumerate(mutationrates):
+                    cell = (populationid, mutationrateid)
+                    value = values[cell] if cell in stats or interpolate else ''
+                    writer.write((currentpopulation, mutationrate), value)
+        finally:
+            writer.close()
+            if self.cache is not None:
+                self.cache.commit()
+            if self.runs is not None:
+                self.runs.flush()
+        return {(populations[populationid], mutationrates[mutationrateid]): result
+                for (populationid, mutationrateid), result in stats.items()}
 
     #Runs the script
-    def run(self, iterations):
-        """Runs the matrix simulator"""
+    def run(self, iterations, resume=False, adaptive=False, ciwidth=None):
+        """Runs the matrix simulator. With resume it only computes the cells missing in data.csv.
+        With adaptive it only runs part of the cells and interpolates the others.
+        With a ciwidth every cell runs until its confidence interval is that narrow,
+        up to iterations times."""
         start_time = time.time()
-        self.fillmap(
-            self.target, self.maxgen, self.minpopulation, self.maxpopulation,
-            self.minmutationrate, self.maxmutationrate, iterations
-            )
+        if ciwidth is not None:
+            stats = self.sequentialmap(
+                self.target, self.maxgen, self.minpopulation, self.maxpopulation,
+                self.minmutationrate, self.maxmutationrate, ciwidth, maxiterations=iterations
+                )
+            print('Ran {} simulations'.format(sum(n for mean, std, n in stats.values())))
+        elif adaptive:
+            cells = self.adaptivemap(
+                self.target, self.maxgen, self.minpopulation, self.maxpopulation,
+                self.minmutationrate, self.maxmutationrate, iterations
+                )
+            populations, mutationrates = PopulationMap.gridranges(
+                self.minpopulation, self.maxpopulation, self.minmutationrate, self.maxmutationrate,
+                self.populationstep, self.mutationratestep)
+            print('Ran {} of {} cells'.format(len(cells), len(populations) * len(mutationrates)))
+        else:
+            self.fillmap(
+                self.target, self.maxgen, self.minpopulation, self.maxpopulation,
+                self.minmutationrate, self.maxmutationrate, iterations, resume
+                )
         print(
             "Mapped {} from {} to {} individuals with {}% to {}% mutation chance on {} iterations".
             format(self.target, self.minpopulation, self.maxpopulation,
                    self.minmutationrate, self.maxmutationrate, iterations
                   )
             )
-        print('After {} seconds'.format(start_time - time.time)
+        print('After {} seconds'.format(time.time() - start_time))
+        for reason, runs in self.stopreasons.items():
+            print('{} runs stopped: {}'.format(runs, reason))
 
 
 #Launch the program
 #Population('to be or not to be', 10, 100).run()
 #Population('unicorn', 5, 100).run()
 #PopulationMap('abcdefghij', 200, 30, 100, 1, 10).run(5)
-PopulationMap('abcdefghij', 200, 30, 100, 1, 10).run(5)
+#VectorPopulation('to be or not to be', 1, 100).run()
+#PopulationMap('abcdefghij', 200, 30, 100, 1, 10, VectorPopulation).run(5)
+#Population('to be or not to be', 2, 100, fitness='distance').run()
+#PopulationMap('abcdefghij', 200, 30, 100, 1, 10, fitness='weighted').run(5)
+#LongPopulation('to be or not to be ' * 1000, 0.01, 100).run()
+if __name__ == '__main__':
+    PopulationMap('abcdefghij', 200, 30, 100, 1, 10).run(5)